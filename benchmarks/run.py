@@ -0,0 +1,176 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Throughput benchmarks for sqlonfhir.
+
+Usage:
+    python -m benchmarks.run --scale 100000 --output results.json
+    python -m benchmarks.run --scale 100000 --compare results.json
+
+Each benchmark case runs in a fresh process so that peak RSS is measured per
+case. Results are written as JSON so runs can be compared across commits.
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import sqlonfhir
+from sqlonfhir.sqlonfhir import compile_fhirpath
+
+from .synthetic import generate
+from .views import VIEWS
+
+# Above this many resources the input is generated while evaluating instead of
+# being held in memory, and generation time is subtracted from the timings
+MATERIALIZE_LIMIT = 1000000
+
+
+def run_case(name, scale, seed):
+    """Run a single benchmark case and return its measurements."""
+    views = VIEWS if name == "all_views_single_pass" else {name: VIEWS[name]}
+
+    compile_fhirpath.cache_clear()
+    start = time.perf_counter()
+    compiled = {
+        view_name: sqlonfhir.compile_view(view) for view_name, view in views.items()
+    }
+    compile_seconds = time.perf_counter() - start
+
+    materialize = scale <= MATERIALIZE_LIMIT
+    generation_seconds = 0.0
+    if materialize:
+        resources = list(generate(scale, seed))
+    else:
+        start = time.perf_counter()
+        for _ in generate(scale, seed):
+            pass
+        generation_seconds = time.perf_counter() - start
+        resources = generate(scale, seed)
+
+    resource_types = {view.resource for view in compiled.values()}
+    matching = 0
+    rows = 0
+    start = time.perf_counter()
+    if len(compiled) == 1:
+        view = next(iter(compiled.values()))
+        for _ in view.iter_rows(resources):
+            rows += 1
+    else:
+        for _ in sqlonfhir.evaluate_many(resources, compiled):
+            rows += 1
+    eval_seconds = max(time.perf_counter() - start - generation_seconds, 1e-9)
+
+    for item in resources if materialize else generate(scale, seed):
+        if item["resourceType"] in resource_types:
+            matching += 1
+
+    return {
+        "case": name,
+        "resource_types": sorted(resource_types),
+        "resources_scanned": scale,
+        "resources_matched": matching,
+        "rows": rows,
+        "compile_seconds": compile_seconds,
+        "eval_seconds": eval_seconds,
+        "rows_per_sec": rows / eval_seconds,
+        "resources_per_sec": scale / eval_seconds,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=10000, help="number of resources")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--case",
+        action="append",
+        choices=[*VIEWS, "all_views_single_pass"],
+        help="case to run, may be repeated (default: all)",
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="compare with results from a previous run")
+    args = parser.parse_args(argv)
+
+    cases = args.case or [*VIEWS, "all_views_single_pass"]
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for name in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_case, name, args.scale, args.seed).result()
+        results.append(result)
+        _print_result(result)
+
+    report = {"meta": _metadata(args), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            _print_comparison(json.load(f), report)
+
+
+def _metadata(args):
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "sqlonfhir_version": sqlonfhir.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "seed": args.seed,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _print_result(result):
+    print(
+        f"{result['case']:<34} {result['rows']:>10} rows "
+        f"{result['rows_per_sec']:>12,.0f} rows/s "
+        f"{result['resources_per_sec']:>12,.0f} resources/s "
+        f"compile {result['compile_seconds'] * 1000:>8.1f} ms "
+        f"rss {result['peak_rss_mb']:>8.1f} MB"
+    )
+
+
+def _print_comparison(baseline, report):
+    print()
+    print(
+        f"Compared with {baseline['meta'].get('commit')} at scale {baseline['meta']['scale']}"
+    )
+    previous = {result["case"]: result for result in baseline["results"]}
+    for result in report["results"]:
+        before = previous.get(result["case"])
+        if before is None:
+            continue
+        change = result["rows_per_sec"] / before["rows_per_sec"] - 1
+        rss_change = result["peak_rss_mb"] - before["peak_rss_mb"]
+        print(
+            f"{result['case']:<34} rows/s {change:>+8.1%}   rss {rss_change:>+8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
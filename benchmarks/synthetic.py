@@ -0,0 +1,203 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Deterministic synthetic FHIR R4 resources for benchmarking.
+
+Resources are generated lazily from a seeded random number generator, so the
+same scale and seed always produce the same data and arbitrarily large sets
+can be streamed without holding them in memory.
+"""
+
+import random
+
+RESOURCE_TYPES = ("Patient", "Observation", "Encounter", "Condition")
+
+# Share of generated resources per type
+MIX = {"Patient": 0.1, "Observation": 0.6, "Encounter": 0.2, "Condition": 0.1}
+
+GIVEN = ["Ada", "Grace", "Alan", "Edsger", "Barbara", "Donald", "Frances", "Ken"]
+FAMILY = ["Lovelace", "Hopper", "Turing", "Dijkstra", "Liskov", "Knuth", "Allen"]
+CITIES = ["Cary", "Raleigh", "Durham", "Chapel Hill", "Apex"]
+VITALS = [
+    ("8867-4", "Heart rate", "/min", 50, 120),
+    ("8310-5", "Body temperature", "Cel", 35, 40),
+    ("29463-7", "Body weight", "kg", 3, 150),
+    ("8302-2", "Body height", "cm", 45, 200),
+]
+LABS = [
+    ("2339-0", "Glucose", "mg/dL", 60, 200),
+    ("2093-3", "Cholesterol", "mg/dL", 100, 300),
+]
+CONDITIONS = [
+    ("44054006", "Diabetes mellitus type 2"),
+    ("38341003", "Hypertensive disorder"),
+    ("195967001", "Asthma"),
+    ("55822004", "Hyperlipidemia"),
+]
+
+
+def generate(count, seed=0, resource_types=RESOURCE_TYPES):
+    """Yield ``count`` synthetic resources of the given types.
+
+    Observations, Encounters and Conditions reference Patients generated
+    earlier in the stream, so ``getReferenceKey()`` joins resolve.
+    """
+    rng = random.Random(seed)
+    weights = [MIX[resource_type] for resource_type in resource_types]
+    patients = 0
+    for i in range(count):
+        resource_type = rng.choices(resource_types, weights)[0]
+        if resource_type == "Patient" or patients == 0:
+            patients += 1
+            yield patient(rng, patients)
+            continue
+        patient_id = f"pt-{rng.randint(1, patients)}"
+        if resource_type == "Observation":
+            yield observation(rng, i, patient_id)
+        elif resource_type == "Encounter":
+            yield encounter(rng, i, patient_id)
+        else:
+            yield condition(rng, i, patient_id)
+
+
+def patient(rng, n):
+    resource = {
+        "resourceType": "Patient",
+        "id": f"pt-{n}",
+        "meta": {"versionId": "1", "lastUpdated": _instant(rng)},
+        "active": rng.random() < 0.9,
+        "gender": rng.choice(["male", "female", "other", "unknown"]),
+        "birthDate": _date(rng, 1930, 2020),
+        "name": [
+            {
+                "use": rng.choice(["official", "usual", "nickname"]),
+                "family": rng.choice(FAMILY),
+                "given": rng.sample(GIVEN, rng.randint(1, 3)),
+            }
+            for _ in range(rng.randint(1, 3))
+        ],
+        "telecom": [
+            {
+                "system": rng.choice(["phone", "email"]),
+                "value": f"555-{rng.randint(1000, 9999)}",
+                "use": rng.choice(["home", "work", "mobile"]),
+            }
+            for _ in range(rng.randint(0, 3))
+        ],
+        "address": [
+            {
+                "use": rng.choice(["home", "work"]),
+                "line": [f"{rng.randint(1, 999)} Main St"],
+                "city": rng.choice(CITIES),
+                "postalCode": f"{rng.randint(27500, 27699)}",
+            }
+            for _ in range(rng.randint(0, 2))
+        ],
+    }
+    if rng.random() < 0.3:
+        resource["contact"] = [
+            {
+                "name": {"family": rng.choice(FAMILY)},
+                "telecom": [
+                    {"system": "phone", "value": f"555-{rng.randint(1000, 9999)}"}
+                ],
+            }
+        ]
+    return resource
+
+
+def observation(rng, n, patient_id):
+    vital = rng.random() < 0.7
+    code, display, unit, low, high = rng.choice(VITALS if vital else LABS)
+    category = "vital-signs" if vital else "laboratory"
+    resource = {
+        "resourceType": "Observation",
+        "id": f"obs-{n}",
+        "meta": {"versionId": "1", "lastUpdated": _instant(rng)},
+        "status": rng.choices(["final", "amended", "preliminary"], [8, 1, 1])[0],
+        "category": [
+            {
+                "coding": [
+                    {
+                        "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                        "code": category,
+                    }
+                ]
+            }
+        ],
+        "code": {
+            "coding": [
+                {"system": "http://loinc.org", "code": code, "display": display}
+            ],
+            "text": display,
+        },
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "effectiveDateTime": _instant(rng),
+        "valueQuantity": {
+            "value": round(rng.uniform(low, high), 1),
+            "unit": unit,
+            "system": "http://unitsofmeasure.org",
+            "code": unit,
+        },
+    }
+    if vital and rng.random() < 0.2:
+        resource["component"] = [
+            {
+                "code": {"coding": [{"system": "http://loinc.org", "code": c}]},
+                "valueQuantity": {"value": rng.randint(60, 140), "unit": "mm[Hg]"},
+            }
+            for c in ("8480-6", "8462-4")
+        ]
+    return resource
+
+
+def encounter(rng, n, patient_id):
+    start = _date(rng, 2015, 2024)
+    return {
+        "resourceType": "Encounter",
+        "id": f"enc-{n}",
+        "meta": {"versionId": "1", "lastUpdated": _instant(rng)},
+        "status": rng.choice(["finished", "in-progress", "cancelled"]),
+        "class": {
+            "system": "http://terminology.hl7.org/CodeSystem/v3-ActCode",
+            "code": rng.choice(["AMB", "EMER", "IMP"]),
+        },
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "period": {"start": start, "end": start},
+        "participant": [
+            {"individual": {"reference": f"Practitioner/pr-{rng.randint(1, 50)}"}}
+            for _ in range(rng.randint(0, 2))
+        ],
+    }
+
+
+def condition(rng, n, patient_id):
+    code, display = rng.choice(CONDITIONS)
+    return {
+        "resourceType": "Condition",
+        "id": f"cond-{n}",
+        "meta": {"versionId": "1", "lastUpdated": _instant(rng)},
+        "clinicalStatus": {
+            "coding": [
+                {
+                    "system": "http://terminology.hl7.org/CodeSystem/condition-clinical",
+                    "code": rng.choice(["active", "resolved"]),
+                }
+            ]
+        },
+        "code": {
+            "coding": [
+                {"system": "http://snomed.info/sct", "code": code, "display": display}
+            ]
+        },
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "onsetDateTime": _instant(rng),
+    }
+
+
+def _date(rng, start_year, end_year):
+    return f"{rng.randint(start_year, end_year)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def _instant(rng):
+    return f"{_date(rng, 2015, 2024)}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z"
@@ -0,0 +1,175 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""Representative view definitions used by the benchmark suite."""
+
+VIEWS = {
+    "patient_flat": {
+        "resource": "Patient",
+        "column": [
+            {"name": "id", "path": "getResourceKey()"},
+            {"name": "gender", "path": "gender"},
+            {"name": "birth_date", "path": "birthDate"},
+            {"name": "active", "path": "active"},
+            {"name": "last_updated", "path": "meta.lastUpdated"},
+            {"name": "family", "path": "name.family.first()"},
+        ],
+    },
+    "patient_names_foreach": {
+        "resource": "Patient",
+        "select": [
+            {"column": [{"name": "id", "path": "getResourceKey()"}]},
+            {
+                "forEach": "name",
+                "column": [
+                    {"name": "use", "path": "use"},
+                    {"name": "family", "path": "family"},
+                ],
+                "select": [
+                    {"forEach": "given", "column": [{"name": "given", "path": "$this"}]}
+                ],
+            },
+        ],
+    },
+    "patient_address_foreach_or_null": {
+        "resource": "Patient",
+        "select": [
+            {"column": [{"name": "id", "path": "getResourceKey()"}]},
+            {
+                "forEachOrNull": "address",
+                "column": [
+                    {"name": "city", "path": "city"},
+                    {"name": "postal_code", "path": "postalCode"},
+                ],
+            },
+        ],
+    },
+    "patient_telecom_union": {
+        "resource": "Patient",
+        "select": [
+            {"column": [{"name": "id", "path": "getResourceKey()"}]},
+            {
+                "unionAll": [
+                    {
+                        "forEach": "telecom",
+                        "column": [
+                            {"name": "system", "path": "system"},
+                            {"name": "value", "path": "value"},
+                        ],
+                    },
+                    {
+                        "forEach": "contact.telecom",
+                        "column": [
+                            {"name": "system", "path": "system"},
+                            {"name": "value", "path": "value"},
+                        ],
+                    },
+                ]
+            },
+        ],
+    },
+    "observation_vitals_where": {
+        "resource": "Observation",
+        "select": [
+            {
+                "column": [
+                    {"name": "id", "path": "getResourceKey()"},
+                    {"name": "patient_id", "path": "subject.getReferenceKey(Patient)"},
+                    {
+                        "name": "code",
+                        "path": "code.coding.where(system = 'http://loinc.org').code.first()",
+                    },
+                    {"name": "effective", "path": "effective.ofType(dateTime)"},
+                    {"name": "value", "path": "value.ofType(Quantity).value"},
+                    {"name": "unit", "path": "value.ofType(Quantity).unit"},
+                ]
+            }
+        ],
+        "where": [
+            {"path": "status = 'final'"},
+            {"path": "category.coding.where(code = 'vital-signs').exists()"},
+        ],
+    },
+    "observation_loinc_wide": {
+        "resource": "Observation",
+        "select": [
+            {
+                "column": [
+                    {"name": "id", "path": "getResourceKey()"},
+                    {"name": "patient_id", "path": "subject.getReferenceKey(Patient)"},
+                    {
+                        "name": "loinc_code",
+                        "path": "code.coding.where(system = 'http://loinc.org').code",
+                    },
+                    {
+                        "name": "loinc_display",
+                        "path": "code.coding.where(system = 'http://loinc.org').display",
+                    },
+                    {
+                        "name": "category",
+                        "path": "category.coding.where(system = 'http://terminology.hl7.org/CodeSystem/observation-category').code",
+                    },
+                    {
+                        "name": "category_system",
+                        "path": "category.coding.where(system = 'http://terminology.hl7.org/CodeSystem/observation-category').system",
+                    },
+                    {"name": "value", "path": "valueQuantity.value"},
+                    {"name": "unit", "path": "valueQuantity.unit"},
+                ]
+            }
+        ],
+        "where": [{"path": "code.coding.where(system = 'http://loinc.org').exists()"}],
+    },
+    "observation_components": {
+        "resource": "Observation",
+        "select": [
+            {"column": [{"name": "id", "path": "getResourceKey()"}]},
+            {
+                "forEach": "component",
+                "column": [
+                    {"name": "code", "path": "code.coding.code.first()"},
+                    {"name": "value", "path": "value.ofType(Quantity).value"},
+                ],
+            },
+        ],
+    },
+    "encounter_reference_keys": {
+        "resource": "Encounter",
+        "select": [
+            {
+                "column": [
+                    {"name": "id", "path": "getResourceKey()"},
+                    {"name": "patient_id", "path": "subject.getReferenceKey(Patient)"},
+                    {"name": "class", "path": "class.code"},
+                    {"name": "start", "path": "period.start"},
+                ]
+            },
+            {
+                "forEachOrNull": "participant",
+                "column": [
+                    {
+                        "name": "practitioner_id",
+                        "path": "individual.getReferenceKey(Practitioner)",
+                    }
+                ],
+            },
+        ],
+    },
+    "condition_codes": {
+        "resource": "Condition",
+        "select": [
+            {
+                "column": [
+                    {"name": "id", "path": "getResourceKey()"},
+                    {"name": "patient_id", "path": "subject.getReferenceKey(Patient)"},
+                    {"name": "code", "path": "code.coding.code.first()"},
+                    {"name": "display", "path": "code.coding.display.first()"},
+                    {
+                        "name": "clinical_status",
+                        "path": "clinicalStatus.coding.code.first()",
+                    },
+                ]
+            }
+        ],
+    },
+}
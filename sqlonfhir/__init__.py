@@ -3,6 +3,58 @@
 
 __version__ = "0.0.2"
 
+from .aio import aiter_evaluate as aiter_evaluate
+from .bulk import RunStats as RunStats
+from .bulk import run_bulk as run_bulk
+from .columnar import ColumnarResult as ColumnarResult
+from .incremental import Changeset as Changeset
+from .incremental import IncrementalEvaluator as IncrementalEvaluator
+from .join import join as join
+from .memory import MemoryBudget as MemoryBudget
+from .ndjson import bulk_data_files as bulk_data_files
+from .ndjson import read_ndjson as read_ndjson
+from .parallel import ParallelEvaluator as ParallelEvaluator
+from .plancache import PlanCache as PlanCache
+from .profiling import Profiler as Profiler
+from .sinks import CsvSink as CsvSink
+from .sinks import NdjsonSink as NdjsonSink
+from .sinks import ParquetSink as ParquetSink
+from .sinks import PartitionedSink as PartitionedSink
+from .sinks import Sink as Sink
+from .sinks import evaluate_to as evaluate_to
+from .sinks import hash_bucket as hash_bucket
+from .sinks import value_prefix as value_prefix
+from .sqlonfhir import CompiledView as CompiledView
+from .sqlonfhir import compile_view as compile_view
 from .sqlonfhir import evaluate as evaluate
+from .sqlonfhir import evaluate_many as evaluate_many
+from .sqlonfhir import iter_evaluate as iter_evaluate
 
-__all__ = ["evaluate"]
+__all__ = [
+    "aiter_evaluate",
+    "bulk_data_files",
+    "Changeset",
+    "ColumnarResult",
+    "CompiledView",
+    "compile_view",
+    "CsvSink",
+    "evaluate",
+    "evaluate_many",
+    "evaluate_to",
+    "hash_bucket",
+    "IncrementalEvaluator",
+    "join",
+    "iter_evaluate",
+    "MemoryBudget",
+    "NdjsonSink",
+    "ParallelEvaluator",
+    "ParquetSink",
+    "PartitionedSink",
+    "PlanCache",
+    "Profiler",
+    "read_ndjson",
+    "run_bulk",
+    "RunStats",
+    "Sink",
+    "value_prefix",
+]
@@ -0,0 +1,6 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from .cli import main
+
+raise SystemExit(main())
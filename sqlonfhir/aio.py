@@ -0,0 +1,102 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import deque
+
+from .sqlonfhir import compile_view
+
+
+async def aiter_evaluate(
+    resources, view_definition, batch_size=1000, max_pending=2, executor=None
+):
+    """Asynchronously evaluate FHIR resources against a view definition.
+
+    Resources are read from an async iterable, such as pages fetched from a
+    FHIR server, and evaluated in batches in an executor while the next
+    batch is being read, so network waits and evaluation overlap. At most
+    ``max_pending`` batches are in flight. Reading from the source pauses
+    until the consumer catches up.
+
+    Args:
+        resources: Async iterable, or plain iterable, of FHIR resource
+            dictionaries. Plain iterables are read in the event loop's
+            default thread pool, so blocking sources such as files or
+            ``read_ndjson()`` do not stall the loop.
+        view_definition: SQL on FHIR view definition specifying how to
+            extract data from the resources.
+        batch_size: Number of resources evaluated per executor call.
+        max_pending: Maximum number of batches being evaluated at once.
+        executor: Optional ``concurrent.futures`` executor. Defaults to the
+            event loop's default thread pool. A ``ProcessPoolExecutor`` runs
+            evaluation outside the event loop's process.
+
+    Yields:
+        Dictionaries representing a row with column name/value pairs, in
+        input order.
+
+    Example:
+        >>> async for row in aiter_evaluate(fetch_pages(url), view):
+        ...     print(row)
+    """
+    import asyncio
+
+    view = compile_view(view_definition)
+    names = view.column_names
+    loop = asyncio.get_running_loop()
+    pending = deque()
+    try:
+        async for batch in _batches(resources, view.resource, batch_size):
+            pending.append(
+                loop.run_in_executor(executor, _evaluate_batch, view_definition, batch)
+            )
+            if len(pending) >= max_pending:
+                for row in await pending.popleft():
+                    yield dict(zip(names, row))
+        while pending:
+            for row in await pending.popleft():
+                yield dict(zip(names, row))
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def _batches(resources, resource_type, batch_size):
+    if not hasattr(resources, "__aiter__"):
+        import asyncio
+
+        # Plain iterables may block, so each batch is pulled in a thread
+        loop = asyncio.get_running_loop()
+        iterator = iter(resources)
+        while True:
+            batch = await loop.run_in_executor(
+                None, _next_batch, iterator, resource_type, batch_size
+            )
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+    batch = []
+    async for resource in resources:
+        if resource.get("resourceType") == resource_type:
+            batch.append(resource)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _next_batch(iterator, resource_type, batch_size):
+    # Returns fewer than batch_size resources only once the iterator is done
+    batch = []
+    for resource in iterator:
+        if resource.get("resourceType") == resource_type:
+            batch.append(resource)
+            if len(batch) >= batch_size:
+                break
+    return batch
+
+
+def _evaluate_batch(view_definition, batch):
+    # Compiled views are cached, so this is a lookup after the first batch
+    return list(compile_view(view_definition).iter_tuples(batch))
@@ -0,0 +1,278 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import sys
+from contextlib import ExitStack
+from itertools import islice
+from time import perf_counter
+
+from .ndjson import bulk_data_files, evaluate_ndjson_lines, ndjson_loader
+from .parallel import evaluate_worker_lines, ordered_results, worker_pool
+from .plancache import write_json_atomic
+from .sinks import CsvSink, NdjsonSink, ParquetSink
+from .sqlonfhir import compile_view, view_key
+
+# Output sinks by file extension
+SINKS = {
+    ".ndjson": NdjsonSink,
+    ".jsonl": NdjsonSink,
+    ".csv": CsvSink,
+    ".parquet": ParquetSink,
+}
+
+# Bumped whenever the layout of a checkpoint file changes
+CHECKPOINT_FORMAT = 2
+
+
+def run_bulk(
+    source,
+    view_definition,
+    output,
+    workers=None,
+    batch_size=10000,
+    parser="json",
+    checkpoint=None,
+    checkpoint_interval=10.0,
+    progress=None,
+    progress_interval=5.0,
+):
+    """Evaluate a Bulk Data export against a view and write the rows to a file.
+
+    The NDJSON files of the view's resource type are streamed a batch of
+    lines at a time. Lines are parsed and evaluated in process or, with
+    ``workers``, in a pool of worker processes while the next batches are
+    read. Batches are written in input order.
+
+    With a ``checkpoint`` file, the position reached in the input and the
+    size of the output are saved every ``checkpoint_interval`` seconds and
+    after every input file. When a run is interrupted, running it again with
+    the same arguments truncates the output to the saved size and continues
+    from the saved position. The checkpoint is removed once the run
+    completes. Parquet files cannot be appended to, so checkpoints need an
+    NDJSON or CSV output.
+
+    Args:
+        source: Directory of a Bulk Data export, or a single NDJSON file.
+        view_definition: SQL on FHIR view definition specifying how to
+            extract data from the resources.
+        output: Output file path. The format is chosen by its extension,
+            ``.ndjson``, ``.jsonl``, ``.csv`` or ``.parquet``.
+        workers: Optional number of worker processes.
+        batch_size: Number of NDJSON lines evaluated at a time.
+        parser: ``"json"``, ``"orjson"`` or a function parsing a line, as for
+            ``read_ndjson()``. Functions must be picklable with workers.
+        checkpoint: Optional path of a checkpoint file to save and resume from.
+        checkpoint_interval: Seconds between checkpoints.
+        progress: Optional function called with the ``RunStats`` every
+            ``progress_interval`` seconds and once the run completes.
+        progress_interval: Seconds between calls to ``progress``.
+
+    Returns:
+        The ``RunStats`` of the run, including any runs it resumed.
+
+    Example:
+        >>> stats = run_bulk("export/", view, "observations.parquet", workers=8)
+        >>> stats.rows_per_second
+        182311.4
+    """
+    extension = os.path.splitext(output)[1].lower()
+    if extension not in SINKS:
+        raise Exception(
+            f"Unknown output format: {output}, expected one of {', '.join(SINKS)}"
+        )
+    if checkpoint is not None and SINKS[extension] is ParquetSink:
+        raise Exception("Checkpoints need an NDJSON or CSV output")
+
+    view = compile_view(view_definition)
+    # Absolute, so checkpoints match however the paths are spelled
+    source = os.path.abspath(source)
+    paths = (
+        bulk_data_files(source, [view.resource]) if os.path.isdir(source) else [source]
+    )
+    key = view_key(view_definition)
+    state = {
+        "format": CHECKPOINT_FORMAT,
+        "view": key,
+        "input": source,
+        "output": os.path.abspath(output),
+        "completed": [],
+        "file": None,
+        "offset": 0,
+        "output_size": 0,
+        "resources": 0,
+        "rows": 0,
+        "seconds": 0.0,
+    }
+    saved = _load_checkpoint(checkpoint) if checkpoint is not None else None
+    if saved is not None:
+        if any(
+            saved.get(name) != state[name]
+            for name in ("format", "view", "input", "output")
+        ):
+            raise Exception(
+                f"Checkpoint {checkpoint} was saved for another view, input or output"
+            )
+        state = saved
+
+    parallel = workers is not None and workers > 1
+    stats = RunStats(len(paths), state, parallel)
+    last_checkpoint = last_progress = perf_counter()
+
+    with ExitStack() as stack:
+        if SINKS[extension] is ParquetSink:
+            file = None
+            sink = ParquetSink(output)
+        else:
+            # Resuming drops any rows written after the last checkpoint
+            file = stack.enter_context(
+                open(output, "r+" if saved else "w", encoding="utf-8", newline="")
+            )
+            file.truncate(state["output_size"])
+            file.seek(state["output_size"])
+            if SINKS[extension] is CsvSink:
+                sink = CsvSink(file, header=not saved)
+            else:
+                sink = SINKS[extension](file)
+        sink.open(view.columns)
+
+        batches = (
+            ((path, offset), lines)
+            for path, offset, lines in _line_batches(paths, state, batch_size)
+        )
+        if parallel:
+            executor = worker_pool(view_definition, workers, parser)
+            stack.callback(executor.shutdown, wait=True, cancel_futures=True)
+            results = ordered_results(
+                executor, evaluate_worker_lines, batches, 2 * workers
+            )
+        else:
+            loads = ndjson_loader(parser)
+            results = (
+                (position, evaluate_ndjson_lines(view, lines, loads))
+                for position, lines in batches
+            )
+
+        for (path, offset), (resources, columns) in results:
+            if columns:
+                sink.write_columns(columns)
+                stats.rows += len(next(iter(columns.values())))
+            stats.resources += resources
+            stats.file = path
+            now = perf_counter()
+            if offset is None:
+                state["completed"].append(path)
+                stats.files_done += 1
+                path, offset = None, 0
+            if checkpoint is not None and (
+                path is None or now - last_checkpoint >= checkpoint_interval
+            ):
+                # Flushed and synced first, so the saved size is on disk
+                file.flush()
+                os.fsync(file.fileno())
+                state.update(
+                    file=path,
+                    offset=offset,
+                    output_size=file.tell(),
+                    resources=stats.resources,
+                    rows=stats.rows,
+                    seconds=stats.elapsed,
+                )
+                write_json_atomic(checkpoint, state)
+                last_checkpoint = now
+            if progress is not None and now - last_progress >= progress_interval:
+                progress(stats)
+                last_progress = now
+        sink.close()
+    if checkpoint is not None and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    if progress is not None:
+        progress(stats)
+    return stats
+
+
+class RunStats:
+    """Progress of a ``run_bulk()`` run.
+
+    Counts include the runs resumed from a checkpoint. ``peak_rss`` is the
+    peak resident memory in bytes of this process, or of the largest worker
+    when larger, where the platform reports it.
+    """
+
+    def __init__(self, files, state, workers=False):
+        self.files = files
+        self.files_done = len(state["completed"])
+        self.file = state["file"]
+        self.resources = state["resources"]
+        self.rows = state["rows"]
+        self._resumed_seconds = state["seconds"]
+        self._started = perf_counter()
+        self._workers = workers
+
+    @property
+    def elapsed(self):
+        return self._resumed_seconds + perf_counter() - self._started
+
+    @property
+    def peak_rss(self):
+        return _peak_rss(self._workers)
+
+    @property
+    def resources_per_second(self):
+        return self.resources / self.elapsed
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed
+
+    def report(self):
+        """Return the counts, rates and peak memory as a dictionary."""
+        return {
+            "files": self.files,
+            "files_done": self.files_done,
+            "resources": self.resources,
+            "rows": self.rows,
+            "seconds": self.elapsed,
+            "resources_per_second": self.resources_per_second,
+            "rows_per_second": self.rows_per_second,
+            "peak_rss": self.peak_rss,
+        }
+
+
+def _line_batches(paths, state, batch_size):
+    # Yields (path, offset after the batch, lines), then (path, None, []) once
+    # the file is complete
+    for path in paths:
+        if path in state["completed"]:
+            continue
+        with open(path, "rb") as f:
+            if path == state["file"]:
+                f.seek(state["offset"])
+            while True:
+                lines = list(islice(f, batch_size))
+                if not lines:
+                    break
+                yield path, f.tell(), lines
+        yield path, None, []
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _peak_rss(workers):
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Kilobytes on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if workers:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale
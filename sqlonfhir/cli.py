@@ -0,0 +1,164 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Command line interface, run as ``python -m sqlonfhir``."""
+
+import argparse
+import json
+import os
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="sqlonfhir", description="Evaluate SQL on FHIR view definitions."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser(
+        "serve", help="run a local HTTP service evaluating NDJSON against views"
+    )
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument(
+        "--view",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="register a view definition file, may be repeated",
+    )
+    serve.add_argument(
+        "--views",
+        metavar="DIR",
+        help="register every .json view definition in a directory by file name",
+    )
+    serve.add_argument("--plan-cache", metavar="DIR", help="on-disk plan cache")
+    serve.add_argument(
+        "--batch-size", type=int, default=1000, help="NDJSON lines per batch"
+    )
+    serve.add_argument(
+        "--workers",
+        type=int,
+        help="evaluate in this many processes instead of a thread pool",
+    )
+    serve.set_defaults(handler=_serve)
+
+    run = commands.add_parser(
+        "run", help="evaluate a Bulk Data export directory or NDJSON file"
+    )
+    run.add_argument("--view", required=True, metavar="PATH", help="view definition")
+    run.add_argument(
+        "--input", required=True, metavar="PATH", help="export directory or file"
+    )
+    run.add_argument(
+        "--output",
+        required=True,
+        metavar="PATH",
+        help="output file, .ndjson, .jsonl, .csv or .parquet",
+    )
+    run.add_argument("--workers", type=int, help="number of worker processes")
+    run.add_argument(
+        "--batch-size", type=int, default=10000, help="NDJSON lines per batch"
+    )
+    run.add_argument("--parser", choices=["json", "orjson"], default="json")
+    run.add_argument(
+        "--checkpoint",
+        metavar="PATH",
+        help="save progress to this file and resume from it when it exists",
+    )
+    run.add_argument(
+        "--progress-interval",
+        type=float,
+        default=5.0,
+        metavar="SECONDS",
+        help="seconds between progress lines",
+    )
+    run.add_argument(
+        "--quiet", action="store_true", help="only print the final summary"
+    )
+    run.set_defaults(handler=_run)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+def _serve(args):
+    import asyncio
+
+    from .plancache import PlanCache
+    from .service import EvaluationService, serve
+
+    executor = None
+    if args.workers:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(args.workers)
+    service = EvaluationService(
+        _load_views(args.view, args.views),
+        plan_cache=PlanCache(args.plan_cache) if args.plan_cache else None,
+        batch_size=args.batch_size,
+        # Enough batches in flight to keep every worker busy
+        max_pending=args.workers + 1 if args.workers else 2,
+        executor=executor,
+    )
+    print(
+        f"Serving {len(service.views)} views on http://{args.host}:{args.port}",
+        flush=True,
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return 0
+
+
+def _run(args):
+    from .bulk import run_bulk
+
+    with open(args.view, encoding="utf-8") as f:
+        view_definition = json.load(f)
+    stats = run_bulk(
+        args.input,
+        view_definition,
+        args.output,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        parser=args.parser,
+        checkpoint=args.checkpoint,
+        progress=None if args.quiet else _print_progress,
+        progress_interval=args.progress_interval,
+    )
+    if args.quiet:
+        _print_progress(stats)
+    return 0
+
+
+def _print_progress(stats):
+    line = (
+        f"[{stats.elapsed:.1f}s] files {stats.files_done}/{stats.files}, "
+        f"{stats.resources:,} resources ({stats.resources_per_second:,.0f}/s), "
+        f"{stats.rows:,} rows ({stats.rows_per_second:,.0f}/s)"
+    )
+    if stats.peak_rss is not None:
+        line += f", peak RSS {stats.peak_rss / 2**20:,.0f} MiB"
+    print(line, file=sys.stderr, flush=True)
+
+
+def _load_views(view_args, directory):
+    paths = {}
+    if directory:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json"):
+                paths[name[: -len(".json")]] = os.path.join(directory, name)
+    for view_arg in view_args:
+        name, separator, path = view_arg.partition("=")
+        if not separator:
+            raise SystemExit(f"--view expects NAME=PATH, got {view_arg}")
+        paths[name] = path
+    views = {}
+    for name, path in paths.items():
+        with open(path, encoding="utf-8") as f:
+            views[name] = json.load(f)
+    return views
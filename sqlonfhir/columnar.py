@@ -0,0 +1,183 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from array import array
+
+# array.array typecodes for column types with a fixed-width representation.
+# Decimals stay Decimal objects, a float64 buffer would round them.
+TYPED_ARRAY_CODES = {
+    "integer": "q",
+    "integer64": "q",
+    "positiveInt": "q",
+    "unsignedInt": "q",
+}
+
+ARROW_TYPES = {"q": "int64"}
+
+
+class ColumnarResult:
+    """Evaluation results stored as one buffer per column.
+
+    Columns are ordered as in the view definition. Columns declaring an
+    integer ``type`` are stored in typed ``array.array`` buffers with a
+    validity bitmap, which can be handed to NumPy (``numpy.frombuffer``) or
+    Arrow without copying. All other columns, including ``decimal`` ones, are
+    stored as Python lists.
+
+    Args:
+        columns: Column definitions from ``CompiledView.columns``.
+
+    Example:
+        >>> result = evaluate(resources, view, output="columnar")
+        >>> result["id"]
+        ['pt1', 'pt2']
+        >>> result.column_buffer("births").values
+        array('q', [2, 0])
+        >>> table = result.to_arrow()
+    """
+
+    def __init__(self, columns):
+        self.columns = {
+            column["name"]: ColumnBuffer(column.get("type"), column.get("collection"))
+            for column in columns
+        }
+        self.num_rows = 0
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, name):
+        return self.columns[name].to_list()
+
+    def column_buffer(self, name):
+        """Return the ``ColumnBuffer`` of a column, without copying it.
+
+        Typed buffers hold 0 for nulls, check ``validity`` before reading
+        their ``values``.
+        """
+        return self.columns[name]
+
+    @property
+    def column_names(self):
+        return list(self.columns)
+
+    def append(self, row):
+        for name, buffer in self.columns.items():
+            buffer.append(row.get(name))
+        self.num_rows += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def extend_tuples(self, rows, column_names):
+        """Append tuple rows laid out as ``column_names``, see ``CompiledView``."""
+        # The last column with a given name wins, as when building a dictionary
+        index = {name: i for i, name in enumerate(column_names)}
+        slots = [(index[name], buffer.append) for name, buffer in self.columns.items()]
+        for row in rows:
+            for i, append in slots:
+                append(row[i])
+            self.num_rows += 1
+
+    def extend_columns(self, columns):
+        """Append a ``{column_name: values}`` batch from ``CompiledView.iter_batches()``."""
+        count = 0
+        for name, buffer in self.columns.items():
+            values = columns[name]
+            buffer.extend(values)
+            count = len(values)
+        self.num_rows += count
+
+    def to_pydict(self):
+        """Return a dictionary of column name to list of values."""
+        return {name: buffer.to_list() for name, buffer in self.columns.items()}
+
+    def to_rows(self):
+        """Return the results as a list of row dictionaries."""
+        values = [buffer.to_list() for buffer in self.columns.values()]
+        return [dict(zip(self.columns, row)) for row in zip(*values)]
+
+    def to_arrow(self):
+        """Return the results as a ``pyarrow.Table``.
+
+        Typed integer columns are wrapped without copying their buffers.
+        ``decimal`` columns are converted to an Arrow decimal type by pyarrow.
+        Requires the optional ``pyarrow`` dependency.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is required for to_arrow()") from None
+
+        return pa.table(
+            {name: buffer.to_arrow(pa) for name, buffer in self.columns.items()}
+        )
+
+
+class ColumnBuffer:
+    """A single column of values, typed where the column type allows it."""
+
+    def __init__(self, type=None, collection=False):
+        typecode = None if collection else TYPED_ARRAY_CODES.get(type)
+        self.typecode = typecode
+        self.values = array(typecode) if typecode else []
+        # Arrow-style validity bitmap, only kept for typed buffers
+        self.validity = bytearray() if typecode else None
+        self.null_count = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        if self.typecode is None:
+            self.values.append(value)
+            return
+
+        index = len(self.values)
+        if index % 8 == 0:
+            self.validity.append(0)
+        if value is None:
+            self.values.append(0)
+            self.null_count += 1
+            return
+        try:
+            self.values.append(value)
+        except (TypeError, OverflowError):
+            # Value does not fit the declared type, keep it as a Python object
+            self._to_untyped()
+            self.values.append(value)
+            return
+        self.validity[index >> 3] |= 1 << (index & 7)
+
+    def extend(self, values):
+        if self.typecode is None:
+            self.values.extend(values)
+            return
+        for value in values:
+            self.append(value)
+
+    def to_list(self):
+        if self.typecode is None:
+            return list(self.values)
+        return [
+            value if self.validity[i >> 3] & (1 << (i & 7)) else None
+            for i, value in enumerate(self.values)
+        ]
+
+    def to_arrow(self, pa):
+        if self.typecode is None:
+            return pa.array(self.values)
+        validity = pa.py_buffer(self.validity) if self.null_count else None
+        return pa.Array.from_buffers(
+            getattr(pa, ARROW_TYPES[self.typecode])(),
+            len(self.values),
+            [validity, pa.py_buffer(self.values)],
+            null_count=self.null_count,
+        )
+
+    def _to_untyped(self):
+        self.values = self.to_list()
+        self.typecode = None
+        self.validity = None
+        self.null_count = 0
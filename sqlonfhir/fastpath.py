@@ -0,0 +1,545 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import re
+from decimal import Decimal
+from functools import lru_cache
+
+# Member names handled by the fast path. Capitalized names are type filters in
+# FHIRPath and `length` has special meaning on strings, so both fall back.
+MEMBER_NAME = re.compile(r"^[a-z][A-Za-z0-9_]*$")
+SIMPLE_STRING = re.compile(r"^'[^'\\]*'$")
+INTEGER = re.compile(r"^[0-9]+$")
+TYPE_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+# Strings every JSON writer emits unescaped
+PLAIN_ASCII = re.compile(r"^[A-Za-z0-9 _.:-]+$")
+
+# Type path of an element reached through a choice type, which depends on the
+# data and so cannot be planned ahead
+CHOICE = object()
+MISSING = object()
+# Memo entry of a prefix the fast path cannot evaluate for a focus
+FALLBACK = object()
+
+# Steps of the getResourceKey() and getReferenceKey() functions. Their
+# results are derived from the data, so nothing may follow them.
+KEY_STEPS = ("resource_key", "reference_key")
+
+# JSON values returned unchanged by the interpreter
+PRIMITIVES = (str, bool, int)
+
+
+class _Fallback(Exception):
+    """Raised when the data needs behaviour only the full interpreter has."""
+
+
+class _Variable:
+    """An external constant such as ``%code``, read from the context when run."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+
+def compile_fast_path(parsed_path, fallback):
+    """Compile simple FHIRPath expressions to plain dict and list walking.
+
+    Supports member navigation, ``first()``, ``exists()``, ``empty()``,
+    ``identity()``, ``getResourceKey()``, ``getReferenceKey()`` and
+    ``where(path = literal)`` with string, boolean or integer literals,
+    optionally compared with ``= literal`` or ``!= literal`` as a whole, as
+    in ``status = 'final'``. Literals may also be variables such as
+    ``%code``, read from the context on each call. Navigation follows the R4
+    model in the same way as fhirpathpy, including choice types, and results
+    are post-processed in the same way, so the output is identical to the
+    interpreter.
+
+    The returned function has a ``steps`` attribute, a hashable form of the
+    expression's steps, and a ``share(cuts)`` method. It returns a function
+    of ``(resource, memo, context)`` keeping the items reached after some of
+    the leading steps in ``memo``, so expressions sharing those steps
+    evaluate them once per resource.
+
+    Args:
+        parsed_path: Expression tree produced by the fhirpathpy parser.
+        fallback: Compiled fhirpathpy expression used for any resource the
+            fast path cannot handle, such as primitive extensions.
+
+    Returns:
+        A function with the same signature as ``fallback``, or None if the
+        expression is outside the supported subset.
+    """
+    steps = _root_steps(parsed_path["children"][0])
+    if steps is None:
+        return None
+
+    # Navigation plans are keyed by the type of the root resource. Each step
+    # adds one operation, so the first k operations are the plan of the
+    # first k steps.
+    plans = {}
+
+    def evaluate(resource, context=None):
+        if isinstance(resource, dict):
+            root = resource.get("resourceType")
+        elif isinstance(resource, list):
+            return fallback(resource, context)
+        else:
+            root = None
+        plan = plans.get(root, MISSING)
+        if plan is MISSING:
+            plan = plans[root] = _plan(steps, root, False)
+        if plan is None:
+            return fallback(resource, context)
+        try:
+            items = _run(plan, [] if resource is None else [resource], context)
+        except _Fallback:
+            return fallback(resource, context)
+        return _visit(items)
+
+    def member_key(root):
+        # The key when the plan for this root type is a single plain member
+        plan = plans.get(root, MISSING)
+        if plan is MISSING:
+            plan = plans[root] = _plan(steps, root, False)
+        if plan is not None and len(plan) == 1 and plan[0][0] == "member":
+            return plan[0][1]
+        return None
+
+    def evaluate_batch(resources, context=None):
+        # Primitive values of a single member are read straight from each
+        # resource, anything else goes through evaluate()
+        results = []
+        root = key = MISSING
+        for resource in resources:
+            if isinstance(resource, dict):
+                if resource.get("resourceType") != root:
+                    root = resource.get("resourceType")
+                    key = member_key(root)
+                if key is not None:
+                    value = resource.get(key)
+                    if type(value) in PRIMITIVES and "_" + key not in resource:
+                        results.append([value])
+                        continue
+            results.append(evaluate(resource, context))
+        return results
+
+    def share(cuts):
+        # evaluate() reading the items reached after the first k steps from
+        # memo[key] for each (k, key) in cuts, or computing and saving them
+        stages = {}
+
+        def evaluate_shared(resource, memo, context=None):
+            root = resource.get("resourceType")
+            split = stages.get(root, MISSING)
+            if split is MISSING:
+                plan = plans.get(root, MISSING)
+                if plan is MISSING:
+                    plan = plans[root] = _plan(steps, root, False)
+                split = stages[root] = None if plan is None else _split(plan, cuts)
+            if split is None:
+                return fallback(resource, context)
+            prefixes, rest = split
+            start, items = 0, [resource]
+            for index in range(len(prefixes) - 1, -1, -1):
+                found = memo.get(prefixes[index][0], MISSING)
+                if found is FALLBACK:
+                    return fallback(resource, context)
+                if found is not MISSING:
+                    start, items = index + 1, found
+                    break
+            try:
+                for key, plan in prefixes[start:]:
+                    try:
+                        items = _run(plan, items, context)
+                    except _Fallback:
+                        memo[key] = FALLBACK
+                        raise
+                    memo[key] = items
+                # The remaining operations build new lists, memo items are unchanged
+                items = _run(rest, items, context)
+            except _Fallback:
+                return fallback(resource, context)
+            return _visit(items)
+
+        return evaluate_shared
+
+    evaluate.batch = evaluate_batch
+    evaluate.share = share
+    evaluate.steps = _steps_key(steps)
+    # Kept under the same name as on compiled fhirpathpy expressions
+    evaluate.parsedPath = parsed_path
+    return evaluate
+
+
+def evaluate_batch(fn, resources, context=None):
+    """Apply a compiled expression to each resource, returning a list of results."""
+    batch = getattr(fn, "batch", None)
+    if batch is not None:
+        return batch(resources, context)
+    return [fn(resource, context) for resource in resources]
+
+
+def required_literals(parsed_path, variables=None):
+    """Return strings that must occur in a resource for the expression to be true.
+
+    Only strings that are guaranteed to appear verbatim as JSON string values
+    are returned, e.g. ``final`` for ``status = 'final'`` or ``vital-signs``
+    for ``category.coding.where(code = 'vital-signs').exists()``. Variables
+    are resolved from ``variables``.
+    """
+    steps = _root_steps(parsed_path["children"][0])
+    if steps is None:
+        return ()
+    kind = steps[-1][0]
+    # Literals compared with a key are only part of a string in the data
+    if kind == "equals" and not _has_key(steps):
+        literals = [steps[-1][1]]
+    elif kind == "exists":
+        literals = [
+            step[2] for step in steps if step[0] == "where" and not _has_key(step[1])
+        ]
+        if any(step[0] in ("exists", "empty", "not_equals") for step in steps[:-1]):
+            return ()
+    else:
+        return ()
+    resolved = []
+    for literal in literals:
+        if isinstance(literal, _Variable):
+            literal = (variables or {}).get(literal.name)
+        if isinstance(literal, str) and PLAIN_ASCII.match(literal):
+            resolved.append(literal)
+    return tuple(resolved)
+
+
+# Expression tree -> steps
+def _root_steps(node):
+    # Path, optionally compared with a literal as a whole
+    if node["type"] == "EqualityExpression" and node["terminalNodeText"] in (
+        ["="],
+        ["!="],
+    ):
+        steps = _steps(node["children"][0])
+        literal = _literal(node["children"][1])
+        if steps is None or literal is MISSING:
+            return None
+        kind = "equals" if node["terminalNodeText"] == ["="] else "not_equals"
+        return steps + [(kind, literal)]
+    return _steps(node)
+
+
+def _steps(node):
+    if node["type"] == "InvocationExpression":
+        left = _steps(node["children"][0])
+        right = _invocation(node["children"][1])
+        if left is None or right is None or left[-1][0] in KEY_STEPS:
+            return None
+        return left + [right]
+    if node["type"] == "TermExpression":
+        term = node["children"][0]
+        if term["type"] == "InvocationTerm":
+            invocation = _invocation(term["children"][0])
+            return None if invocation is None else [invocation]
+    return None
+
+
+def _invocation(node):
+    if node["type"] == "MemberInvocation":
+        name = node["children"][0]["text"]
+        if MEMBER_NAME.match(name) and name != "length":
+            return ("member", name)
+    elif node["type"] == "FunctionInvocation":
+        functn = node["children"][0]
+        name = functn["children"][0]["text"]
+        params = (
+            functn["children"][1]["children"] if len(functn["children"]) > 1 else []
+        )
+        if not params and name in ("first", "exists", "empty", "identity"):
+            return (name,)
+        if not params and name == "getResourceKey":
+            return ("resource_key",)
+        if name == "getReferenceKey" and len(params) <= 1:
+            if not params:
+                return ("reference_key", None)
+            return _type_name(params[0])
+        if name == "where" and len(params) == 1:
+            return _where(params[0])
+    return None
+
+
+def _type_name(node):
+    # The resource type given to getReferenceKey(), passed on as its text
+    if node["type"] != "TermExpression":
+        return None
+    term = node["children"][0]
+    if term["type"] != "InvocationTerm":
+        return None
+    invocation = term["children"][0]
+    if invocation["type"] != "MemberInvocation":
+        return None
+    name = invocation["children"][0]["text"]
+    if not TYPE_NAME.match(name):
+        return None
+    return ("reference_key", name)
+
+
+def _where(node):
+    if node["type"] != "EqualityExpression" or node["terminalNodeText"] != ["="]:
+        return None
+    criteria = _steps(node["children"][0])
+    literal = _literal(node["children"][1])
+    if criteria is None or literal is MISSING:
+        return None
+    return ("where", criteria, literal)
+
+
+def _literal(node):
+    if node["type"] != "TermExpression":
+        return MISSING
+    if node["children"][0]["type"] == "ExternalConstantTerm":
+        constant = node["children"][0]["children"][0]["children"][0]
+        if constant["type"] != "Identifier":
+            return MISSING
+        return _Variable(constant["text"].replace("`", ""))
+    if node["children"][0]["type"] != "LiteralTerm":
+        return MISSING
+    literal = node["children"][0]["children"][0]
+    text = literal["text"]
+    if literal["type"] == "StringLiteral" and SIMPLE_STRING.match(text):
+        return text[1:-1]
+    if literal["type"] == "BooleanLiteral":
+        return text == "true"
+    if literal["type"] == "NumberLiteral" and INTEGER.match(text):
+        return int(text)
+    return MISSING
+
+
+def _has_key(steps):
+    return any(
+        step[0] in KEY_STEPS or (step[0] == "where" and _has_key(step[1]))
+        for step in steps
+    )
+
+
+def _steps_key(steps):
+    # Hashable form of steps. Literals keep their type, as True == 1.
+    key = []
+    for step in steps:
+        if step[0] == "where":
+            key.append(("where", _steps_key(step[1]), _literal_key(step[2])))
+        elif step[0] in ("equals", "not_equals"):
+            key.append((step[0], _literal_key(step[1])))
+        else:
+            key.append(step)
+    return tuple(key)
+
+
+def _literal_key(literal):
+    if isinstance(literal, _Variable):
+        return ("%", literal.name)
+    return (type(literal).__name__, literal)
+
+
+# Steps -> navigation plan for a given root type
+@lru_cache(maxsize=None)
+def _model():
+    # Loaded when the first plan is built, not when sqlonfhir is imported.
+    # The R4 files are read the way fhirpathpy.models reads them, as
+    # importing it imports fhirpathpy and with it the parser and antlr4.
+    import importlib.util
+    import json
+
+    spec = importlib.util.find_spec("fhirpathpy")
+    directory = os.path.join(spec.submodule_search_locations[0], "models", "r4")
+    model = {}
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name)) as f:
+                model[name[:-5]] = json.load(f)
+    return model
+
+
+def _plan(steps, path, nested):
+    model = _model()
+    plan = []
+    for step in steps:
+        if step[0] == "member":
+            if path is CHOICE:
+                return None
+            key = step[1]
+            child = f"{path}.{key}" if path else f"_.{key}"
+            child = model["pathsDefinedElsewhere"].get(child, child)
+            choices = model["choiceTypePaths"].get(child)
+            if choices:
+                plan.append(("choice", tuple(key + type for type in choices), nested))
+                path = CHOICE
+            else:
+                if key == "extension":
+                    child = "Extension"
+                plan.append(("member", key, nested))
+                path = model["path2Type"].get(child, child)
+            nested = True
+        elif step[0] == "where":
+            if path is CHOICE:
+                return None
+            criteria = _plan(step[1], path, nested)
+            if criteria is None:
+                return None
+            plan.append(("where", criteria, step[2]))
+        elif step[0] == "identity":
+            # identity() returns plain data, dropping the element's type
+            plan.append(step)
+            if nested:
+                path = None
+        else:
+            plan.append(step)
+    return plan
+
+
+def _split(plan, cuts):
+    # ([(key, operations since the previous cut)], remaining operations)
+    prefixes = []
+    start = 0
+    for k, key in cuts:
+        prefixes.append((key, plan[start:k]))
+        start = k
+    return prefixes, plan[start:]
+
+
+# Plan execution
+def _run(plan, items, context):
+    for op in plan:
+        kind = op[0]
+        if kind == "member":
+            items = _member(items, op[1], op[2])
+        elif kind == "choice":
+            items = _choice(items, op[1], op[2])
+        elif kind == "where":
+            items = _filter(items, op[1], _resolve(op[2], context), context)
+        elif kind == "first":
+            items = items[:1]
+        elif kind == "exists":
+            items = [len(items) > 0]
+        elif kind == "empty":
+            items = [len(items) == 0]
+        elif kind == "equals":
+            items = _equals(items, _resolve(op[1], context))
+        elif kind == "not_equals":
+            items = [not equal for equal in _equals(items, _resolve(op[1], context))]
+        elif kind == "resource_key":
+            items = [_key_field(items, "id")]
+        elif kind == "reference_key":
+            reference = _key_field(items, "reference")
+            if op[1] and not reference.startswith(op[1]):
+                items = []
+            else:
+                items = [reference[reference.find("/") + 1 :]]
+        # identity() leaves the collection unchanged
+    return items
+
+
+def _member(items, key, nested):
+    result = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        if "_" + key in item or (nested and "resourceType" in item):
+            raise _Fallback
+        value = item.get(key)
+        if value is None:
+            continue
+        if isinstance(value, list):
+            result += value
+        else:
+            result.append(value)
+    return result
+
+
+def _choice(items, fields, nested):
+    result = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        if nested and "resourceType" in item:
+            raise _Fallback
+        for field in fields:
+            if "_" + field in item:
+                raise _Fallback
+            value = item.get(field)
+            if value is None:
+                continue
+            if isinstance(value, list):
+                result += value
+            else:
+                result.append(value)
+            break
+    return result
+
+
+def _key_field(items, field):
+    # Mirrors ViewDefinitionEvaluator.get_resource_key() and
+    # get_reference_key(), which read the field of the first item. Anything
+    # but a string field is left to them, including their errors.
+    if not items or not isinstance(items[0], dict):
+        raise _Fallback
+    value = items[0].get(field)
+    if not isinstance(value, str):
+        raise _Fallback
+    return value
+
+
+def _resolve(literal, context):
+    if not isinstance(literal, _Variable):
+        return literal
+    value = (context or {}).get(literal.name, MISSING)
+    # Only plain string, boolean and integer values compare like literals
+    if not isinstance(value, (str, int)):
+        raise _Fallback
+    return value
+
+
+def _filter(items, criteria, literal, context):
+    result = []
+    for item in items:
+        values = _run(criteria, [item], context)
+        if len(values) != 1:
+            continue
+        value = values[0]
+        if not isinstance(value, (str, int)):
+            raise _Fallback
+        if value == literal:
+            result.append(item)
+    return result
+
+
+def _equals(items, literal):
+    if not items:
+        return []
+    if len(items) != 1:
+        return [False]
+    value = items[0]
+    # Strings compare with strings, booleans and integers with each other
+    if isinstance(value, str) != isinstance(literal, str) or not isinstance(
+        value, (str, int)
+    ):
+        raise _Fallback
+    return [value == literal]
+
+
+def _visit(node):
+    # Mirrors the result conversion at the end of fhirpathpy.apply_parsed_path
+    if isinstance(node, float):
+        return Decimal(str(node))
+    if isinstance(node, list):
+        result = []
+        for item in node:
+            item = _visit(item)
+            if isinstance(item, dict) and list(item.keys()) == ["extension"]:
+                continue
+            result.append(item)
+        return result
+    if isinstance(node, dict):
+        for key, value in node.items():
+            node[key] = _visit(value)
+    return node
@@ -0,0 +1,131 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import json
+from decimal import Decimal
+
+from .sqlonfhir import compile_view, view_key
+
+
+class IncrementalEvaluator:
+    """Evaluate only the resources that changed since the previous run.
+
+    The evaluator remembers a version token for every resource it has seen,
+    keyed by the resource key (``getResourceKey()``, the resource ``id``).
+    The token is built from ``meta.versionId`` and ``meta.lastUpdated``, or
+    from a hash of the resource content when neither is present, and from
+    the view definition, so changing the view re-evaluates every resource.
+    Resources with an unchanged token are skipped without being evaluated.
+
+    Args:
+        view_definition: SQL on FHIR view definition specifying how to
+            extract data from the resources.
+        versions: Optional ``{resource_key: token}`` mapping saved from
+            ``versions`` after a previous run.
+
+    Example:
+        >>> evaluator = IncrementalEvaluator(view, versions=json.load(f))
+        >>> changes = evaluator.changes(read_ndjson("Patient.ndjson"), complete=True)
+        >>> changes.apply(table)
+        >>> json.dump(evaluator.versions, f)
+    """
+
+    def __init__(self, view_definition, versions=None):
+        self.view = compile_view(view_definition)
+        self.view_key = view_key(view_definition)
+        self.versions = dict(versions or {})
+
+    def changes(self, resources, deleted=(), complete=False):
+        """Evaluate new and changed resources and return a ``Changeset``.
+
+        Args:
+            resources: Iterable of FHIR resource dictionaries.
+            deleted: Keys of resources known to have been deleted, e.g. from
+                the deleted list of a Bulk Data ``_since`` export.
+            complete: True when ``resources`` holds every current resource,
+                so that previously seen resources missing from it are
+                deleted.
+
+        Returns:
+            A ``Changeset`` with the rows of new and changed resources and
+            the keys of resources whose rows should be removed.
+        """
+        changeset = Changeset()
+        seen = set() if complete else None
+        for resource in resources:
+            if resource.get("resourceType") != self.view.resource:
+                continue
+            if "id" not in resource:
+                raise Exception("Resources need an id to be evaluated incrementally")
+            key = resource["id"]
+            if seen is not None:
+                seen.add(key)
+            token = version_token(resource, self.view_key)
+            if self.versions.get(key) == token:
+                changeset.unchanged += 1
+                continue
+            rows = list(self.view.resource_rows(resource))
+            if rows:
+                changeset.upserts[key] = rows
+            elif key in self.versions:
+                changeset.deletes.add(key)
+            self.versions[key] = token
+
+        removed = set(deleted)
+        if seen is not None:
+            removed |= self.versions.keys() - seen
+        for key in removed:
+            if self.versions.pop(key, None) is not None:
+                changeset.upserts.pop(key, None)
+                changeset.deletes.add(key)
+        return changeset
+
+
+class Changeset:
+    """Row level changes produced by ``IncrementalEvaluator.changes()``.
+
+    Attributes:
+        upserts: Mapping of resource key to the complete list of rows for
+            that resource, replacing any rows previously stored for it.
+        deletes: Set of resource keys whose rows should be removed.
+        unchanged: Number of resources skipped because they did not change.
+    """
+
+    def __init__(self):
+        self.upserts = {}
+        self.deletes = set()
+        self.unchanged = 0
+
+    def __len__(self):
+        return len(self.upserts) + len(self.deletes)
+
+    def apply(self, table):
+        """Apply the changes to a ``{resource_key: rows}`` table in place."""
+        for key in self.deletes:
+            table.pop(key, None)
+        table.update(self.upserts)
+        return table
+
+
+def version_token(resource, key=""):
+    """Return the version token used to detect changes to a resource.
+
+    ``key`` is the ``view_key()`` of the view the resource is evaluated for.
+    """
+    meta = resource.get("meta") or {}
+    if "versionId" in meta or "lastUpdated" in meta:
+        return f"{key[:16]}|{meta.get('versionId', '')}|{meta.get('lastUpdated', '')}"
+    canonical = json.dumps(
+        resource, sort_keys=True, separators=(",", ":"), default=_token_value
+    )
+    return hashlib.sha256(f"{key}|{canonical}".encode()).hexdigest()
+
+
+def _token_value(value):
+    # Evaluation turns floats into Decimal in place, so a Decimal that came
+    # from a float hashes as that float and the token stays the same
+    if isinstance(value, Decimal):
+        number = float(value)
+        return number if Decimal(repr(number)) == value else str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
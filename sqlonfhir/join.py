@@ -0,0 +1,145 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import pickle
+import tempfile
+from itertools import chain
+
+
+def join(
+    left,
+    right,
+    on,
+    how="inner",
+    suffix="_right",
+    max_build_rows=1000000,
+    partitions=16,
+    spill_dir=None,
+):
+    """Hash join two streams of rows on a key column.
+
+    Intended for joining views on the keys produced by ``getResourceKey()``
+    and ``getReferenceKey()``, e.g. Observations to Patients. The ``right``
+    rows are loaded into a hash table and the ``left`` rows are streamed
+    through it, so ``right`` should be the smaller side. Rows with a null
+    key never match.
+
+    When ``right`` has more than ``max_build_rows`` rows, both sides are
+    partitioned by key into temporary files, which are then joined one
+    partition at a time. Rows are returned in ``left`` order unless the
+    join spills.
+
+    Args:
+        left: Iterable of row dictionaries, streamed once.
+        right: Iterable of row dictionaries used to build the hash table.
+        on: ``(left_column, right_column)`` tuple, or a single column name
+            present on both sides.
+        how: ``"inner"``, or ``"left"`` to also return ``left`` rows without
+            a match, with nulls for the ``right`` columns.
+        suffix: Appended to ``right`` column names that also occur in
+            ``left``.
+        max_build_rows: Maximum number of ``right`` rows held in memory.
+            Larger right sides are spilled to disk.
+        partitions: Number of partitions used when spilling.
+        spill_dir: Directory for spill files, defaults to the system
+            temporary directory.
+
+    Yields:
+        Joined row dictionaries.
+
+    Example:
+        >>> observations = iter_evaluate(read_ndjson("Observation.ndjson"), observation_view)
+        >>> patients = iter_evaluate(read_ndjson("Patient.ndjson"), patient_view)
+        >>> for row in join(observations, patients, on=("patient_id", "id")):
+        ...     print(row)
+    """
+    if how not in ("inner", "left"):
+        raise Exception(f"Unknown join type: {how}")
+    left_key, right_key = (on, on) if isinstance(on, str) else on
+
+    table = {}
+    right_columns = {}
+    rows = iter(right)
+    for count, row in enumerate(rows, 1):
+        right_columns.update(dict.fromkeys(row))
+        key = row.get(right_key)
+        if key is not None:
+            table.setdefault(key, []).append(row)
+        if count > max_build_rows:
+            spilled = chain(chain.from_iterable(table.values()), rows)
+            table = None
+            yield from _grace_join(
+                left,
+                spilled,
+                left_key,
+                right_key,
+                how,
+                suffix,
+                right_columns,
+                partitions,
+                spill_dir,
+            )
+            return
+
+    yield from _probe(left, table, left_key, how, suffix, right_columns)
+
+
+def _probe(left, table, left_key, how, suffix, right_columns):
+    nulls = dict.fromkeys(right_columns)
+    for left_row in left:
+        matches = table.get(left_row.get(left_key))
+        if matches:
+            for right_row in matches:
+                yield _merge(left_row, right_row, suffix)
+        elif how == "left":
+            yield _merge(left_row, nulls, suffix)
+
+
+def _grace_join(
+    left, right, left_key, right_key, how, suffix, right_columns, partitions, spill_dir
+):
+    with tempfile.TemporaryDirectory(prefix="sqlonfhir-join-", dir=spill_dir) as path:
+        right_files = _partition(
+            right, right_key, partitions, path, "right", right_columns
+        )
+        left_files = _partition(left, left_key, partitions, path, "left", None)
+        for left_file, right_file in zip(left_files, right_files):
+            table = {}
+            for row in _read_partition(right_file):
+                key = row.get(right_key)
+                if key is not None:
+                    table.setdefault(key, []).append(row)
+            yield from _probe(
+                _read_partition(left_file), table, left_key, how, suffix, right_columns
+            )
+
+
+def _partition(rows, key, partitions, path, side, columns):
+    names = [os.path.join(path, f"{side}-{i}.pickle") for i in range(partitions)]
+    files = [open(name, "wb") for name in names]
+    try:
+        for row in rows:
+            if columns is not None:
+                columns.update(dict.fromkeys(row))
+            pickle.dump(row, files[hash(row.get(key)) % partitions])
+    finally:
+        for f in files:
+            f.close()
+    return names
+
+
+def _read_partition(name):
+    with open(name, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _merge(left_row, right_row, suffix):
+    row = dict(left_row)
+    for name, value in right_row.items():
+        row[name + suffix if name in left_row else name] = value
+    return row
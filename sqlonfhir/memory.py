@@ -0,0 +1,160 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import pickle
+import tempfile
+from decimal import Decimal
+from sys import getsizeof
+
+# Rows are pickled to spill files in chunks of this many rows
+SPILL_CHUNK_ROWS = 1000
+
+SCALARS = frozenset([str, int, float, bool, Decimal, type(None)])
+
+
+class MemoryBudget:
+    """An approximate limit on the bytes of rows buffered during evaluation.
+
+    Rows are buffered where a ``select`` combines several parts, every part
+    but the last being materialized, and in the sinks and batches of
+    ``evaluate_to()``. With a budget, buffered rows are counted by their
+    approximate size. Once the total would exceed ``limit``, further
+    intermediate rows are spilled to temporary files and ``ParquetSink``
+    writes its pending rows early. Rows being yielded are not buffered and
+    are not counted.
+
+    Args:
+        limit: Approximate number of bytes that may be buffered at once.
+        spill_dir: Directory for spill files, defaults to the system
+            temporary directory.
+
+    Example:
+        >>> budget = MemoryBudget(256 * 1024 * 1024)
+        >>> evaluate_to(read_ndjson("Observation.ndjson"), view, sink, memory_budget=budget)
+        >>> budget.report()
+        {'limit': 268435456, 'peak': 1843200, 'spilled_rows': 0, 'spill_files': 0}
+    """
+
+    def __init__(self, limit, spill_dir=None):
+        self.limit = limit
+        self.spill_dir = spill_dir
+        self.used = 0
+        self.peak = 0
+        self.spilled_rows = 0
+        self.spill_files = 0
+
+    def reserve(self, nbytes):
+        self.used += nbytes
+        if self.used > self.peak:
+            self.peak = self.used
+
+    def release(self, nbytes):
+        self.used -= nbytes
+
+    def exceeded(self):
+        return self.used > self.limit
+
+    def buffer(self, rows):
+        """Materialize rows, spilling them to a file once over the budget."""
+        buffer = RowBuffer(self)
+        for row in rows:
+            buffer.append(row)
+        return buffer
+
+    def report(self):
+        """Return the limit, the peak number of bytes buffered and spill counts."""
+        return {
+            "limit": self.limit,
+            "peak": self.peak,
+            "spilled_rows": self.spilled_rows,
+            "spill_files": self.spill_files,
+        }
+
+
+class RowBuffer:
+    """Rows held in memory while they fit the budget, and in a file after that.
+
+    The rows can be iterated any number of times. ``close()`` releases the
+    reserved bytes and removes the spill file.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.rows = []
+        self.nbytes = 0
+        self.count = 0
+        self.path = None
+        self.file = None
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        self.count += 1
+        if self.path is None:
+            nbytes = approximate_size(row)
+            if self.budget.used + nbytes <= self.budget.limit:
+                self.rows.append(row)
+                self.nbytes += nbytes
+                self.budget.reserve(nbytes)
+                return
+            self._spill()
+        self.rows.append(row)
+        self.budget.spilled_rows += 1
+        if len(self.rows) >= SPILL_CHUNK_ROWS:
+            pickle.dump(self.rows, self.file, pickle.HIGHEST_PROTOCOL)
+            self.rows = []
+
+    def __iter__(self):
+        if self.path is None:
+            yield from self.rows
+            return
+        if self.rows:
+            pickle.dump(self.rows, self.file, pickle.HIGHEST_PROTOCOL)
+            self.rows = []
+        self.file.flush()
+        with open(self.path, "rb") as f:
+            while True:
+                try:
+                    yield from pickle.load(f)
+                except EOFError:
+                    return
+
+    def close(self):
+        self.budget.release(self.nbytes)
+        self.nbytes = 0
+        self.rows = []
+        if self.path is not None:
+            self.file.close()
+            os.remove(self.path)
+            self.path = self.file = None
+
+    def _spill(self):
+        # The rows buffered so far move to the file with the rest
+        fd, self.path = tempfile.mkstemp(
+            prefix="sqlonfhir-spill-", suffix=".pickle", dir=self.budget.spill_dir
+        )
+        self.file = os.fdopen(fd, "wb")
+        self.budget.release(self.nbytes)
+        self.budget.spill_files += 1
+        self.budget.spilled_rows += len(self.rows)
+        self.nbytes = 0
+
+
+def approximate_size(value):
+    """Return the approximate number of bytes used by a row or value.
+
+    Dictionary keys are not counted, as rows share their column names.
+    """
+    size = getsizeof(value)
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (tuple, list)):
+        return size
+    for item in value:
+        if type(item) in SCALARS:
+            size += getsizeof(item)
+        else:
+            size += approximate_size(item)
+    return size
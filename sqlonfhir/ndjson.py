@@ -0,0 +1,193 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import mmap
+import os
+import re
+from functools import lru_cache
+
+# The top-level resourceType of a raw NDJSON line. Only trusted when the key
+# occurs once in the line, contained resources and Bundles repeat it.
+RESOURCE_TYPE_KEY = b'"resourceType"'
+RESOURCE_TYPE = re.compile(rb'"resourceType"\s*:\s*"([^"\\]*)"')
+RESOURCE_TYPE_TEXT = re.compile(r'"resourceType"\s*:\s*"([^"\\]*)"')
+
+# Bulk Data exports write one file per resource type, e.g. Patient.ndjson or
+# Observation.001.ndjson
+BULK_DATA_FILE = re.compile(r"^([A-Z][A-Za-z]*)(?:[._-]\d+)*\.ndjson$")
+
+
+def read_ndjson(
+    source, resource_types=None, parser="json", memory_map=False, must_contain=()
+):
+    """Lazily read FHIR resources from an NDJSON source.
+
+    Each non-blank line is parsed only when the consumer asks for the next
+    resource, so arbitrarily large Bulk Data exports can be streamed through
+    ``iter_evaluate()`` without loading the file into memory.
+
+    Args:
+        source: Path to an NDJSON file, a directory of NDJSON files such as a
+            Bulk Data export, or an open text or binary file object.
+        resource_types: Optional resource type, or collection of resource
+            types, to read. Lines of other types are skipped before they are
+            parsed whenever the resource type can be read from the raw line,
+            and per-type files of other types in a directory are not opened.
+        parser: ``"json"``, ``"orjson"`` (requires the optional ``orjson``
+            package) or a function parsing a single line.
+        memory_map: Memory map files instead of reading them through a
+            buffer. Ignored for file objects.
+        must_contain: Strings that must all occur as JSON string values in a
+            line for it to be parsed, such as ``CompiledView.required_literals``.
+
+    Yields:
+        FHIR resource dictionaries, one per line.
+
+    Example:
+        >>> patients = read_ndjson("export/", resource_types="Patient")
+        >>> for row in iter_evaluate(patients, view):
+        ...     print(row)
+    """
+    if isinstance(resource_types, str):
+        resource_types = frozenset([resource_types])
+    elif resource_types is not None:
+        resource_types = frozenset(resource_types)
+    loads = ndjson_loader(parser)
+
+    if hasattr(source, "read"):
+        yield from parse_ndjson_lines(source, loads, resource_types, must_contain)
+        return
+
+    paths = (
+        bulk_data_files(source, resource_types) if os.path.isdir(source) else [source]
+    )
+    for path in paths:
+        with open(path, "rb") as f:
+            # Empty files cannot be memory mapped
+            if memory_map and os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    lines = iter(mapped.readline, b"")
+                    yield from parse_ndjson_lines(
+                        lines, loads, resource_types, must_contain
+                    )
+            else:
+                yield from parse_ndjson_lines(f, loads, resource_types, must_contain)
+
+
+def bulk_data_files(directory, resource_types=None):
+    """Return the NDJSON files in a directory, in name order.
+
+    Files named after a resource type, as written by a Bulk Data export, are
+    left out when their type is not in ``resource_types``.
+    """
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".ndjson"):
+            continue
+        if resource_types is not None:
+            match = BULK_DATA_FILE.match(name)
+            if (
+                match
+                and match[1] in _resource_type_names()
+                and match[1] not in resource_types
+            ):
+                continue
+        paths.append(os.path.join(directory, name))
+    return paths
+
+
+@lru_cache(maxsize=None)
+def _resource_type_names():
+    from .fastpath import _model
+
+    return frozenset(
+        name
+        for name, parent in _model()["type2Parent"].items()
+        if parent in ("DomainResource", "Resource")
+    )
+
+
+def ndjson_loader(parser):
+    """Return the function parsing a line for a ``read_ndjson()`` parser."""
+    if callable(parser):
+        return parser
+    if parser == "json":
+        return json.loads
+    if parser == "orjson":
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError('orjson is required for parser="orjson"') from None
+        return orjson.loads
+    raise Exception(f"Unknown NDJSON parser: {parser}")
+
+
+def parse_ndjson_lines(lines, loads, resource_types=None, must_contain=()):
+    """Parse NDJSON lines, filtered as by ``read_ndjson()``.
+
+    Args:
+        lines: Iterable of lines as ``str`` or ``bytes``.
+        loads: Function parsing a line, see ``ndjson_loader()``.
+        resource_types: Optional collection of resource types to keep.
+        must_contain: Strings that must all occur as JSON string values in
+            a line for it to be parsed.
+
+    Yields:
+        FHIR resource dictionaries.
+    """
+    needles = [f'"{literal}"' for literal in must_contain]
+    byte_needles = [needle.encode() for needle in needles]
+    for line in lines:
+        if not line.strip():
+            continue
+        if needles and not all(
+            needle in line
+            for needle in (byte_needles if isinstance(line, bytes) else needles)
+        ):
+            continue
+        if resource_types is None:
+            yield loads(line)
+            continue
+        resource_type = _peek_resource_type(line)
+        if resource_type is None:
+            resource = loads(line)
+            if resource.get("resourceType") in resource_types:
+                yield resource
+        elif resource_type in resource_types:
+            yield loads(line)
+
+
+def evaluate_ndjson_lines(view, lines, loads=json.loads):
+    """Parse a batch of NDJSON lines and evaluate them against a view.
+
+    Only lines of the view's resource type that can match its ``where``
+    clauses are parsed, see ``CompiledView.required_literals``.
+
+    Args:
+        view: A ``CompiledView``.
+        lines: List of NDJSON lines as ``str`` or ``bytes``.
+        loads: Function parsing a line, see ``ndjson_loader()``.
+
+    Returns:
+        A tuple of the number of resources evaluated and a
+        ``{column_name: values}`` batch, or None when there are no resources.
+    """
+    resources = list(
+        parse_ndjson_lines(
+            lines, loads, frozenset([view.resource]), view.required_literals
+        )
+    )
+    return len(resources), next(view.iter_batches(resources, len(resources) or 1), None)
+
+
+def _peek_resource_type(line):
+    if isinstance(line, str):
+        if line.count('"resourceType"') != 1:
+            return None
+        match = RESOURCE_TYPE_TEXT.search(line)
+        return match[1] if match else None
+    if line.count(RESOURCE_TYPE_KEY) != 1:
+        return None
+    match = RESOURCE_TYPE.search(line)
+    return match[1].decode() if match else None
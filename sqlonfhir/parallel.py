@@ -0,0 +1,156 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+from collections import deque
+from itertools import islice
+
+from .ndjson import evaluate_ndjson_lines, ndjson_loader
+from .sqlonfhir import compile_view
+
+# View compiled and line parser chosen once per worker process by
+# _init_worker()
+_worker_view = None
+_worker_loads = None
+
+
+class ParallelEvaluator:
+    """Evaluate a view definition across a pool of worker processes.
+
+    The input is read lazily and split into chunks which are evaluated in
+    worker processes. Each worker compiles the view definition once when it
+    starts. Only a bounded number of chunks are in flight at any time, so
+    streaming inputs such as ``read_ndjson()`` are never fully materialised.
+    Rows are yielded in the same order as serial evaluation.
+
+    Args:
+        view_definition: SQL on FHIR view definition specifying how to
+            extract data from the resources.
+        workers: Number of worker processes. Defaults to the CPU count.
+        chunk_size: Number of resources sent to a worker at a time.
+        max_pending: Maximum number of chunks in flight. Defaults to twice
+            the number of workers.
+
+    Example:
+        >>> evaluator = ParallelEvaluator(view, workers=8)
+        >>> for row in evaluator.iter_rows(read_ndjson("Observation.ndjson")):
+        ...     print(row)
+    """
+
+    def __init__(
+        self, view_definition, workers=None, chunk_size=1000, max_pending=None
+    ):
+        # Compile in the parent too so invalid views fail before any work starts
+        compiled = compile_view(view_definition)
+        self.resource = compiled.resource
+        self.column_names = compiled.column_names
+        self.view_definition = view_definition
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or 2 * self.workers
+
+    def iter_rows(self, resources):
+        """Lazily evaluate resources in parallel, yielding rows in input order."""
+        names = self.column_names
+        for row in self.iter_tuples(resources):
+            yield dict(zip(names, row))
+
+    def iter_tuples(self, resources):
+        """Like ``iter_rows()``, but yield rows as tuples ordered as ``column_names``."""
+        executor = worker_pool(self.view_definition, self.workers)
+        chunks = ((None, chunk) for chunk in self._chunks(resources))
+        try:
+            for _, rows in ordered_results(
+                executor, _evaluate_chunk, chunks, self.max_pending
+            ):
+                yield from rows
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def evaluate(self, resources):
+        """Evaluate resources in parallel and return a list of rows."""
+        return list(self.iter_rows(resources))
+
+    def _chunks(self, resources):
+        # Filter by resource type before pickling to avoid shipping resources
+        # the workers would skip anyway
+        matching = (
+            resource
+            for resource in resources
+            if resource.get("resourceType") == self.resource
+        )
+        while True:
+            chunk = list(islice(matching, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def worker_pool(view_definition, workers, parser="json"):
+    """Start a process pool whose workers each compile the view once.
+
+    Args:
+        view_definition: SQL on FHIR view definition evaluated by the workers.
+        workers: Number of worker processes.
+        parser: NDJSON line parser used by ``evaluate_worker_lines()``, as
+            for ``read_ndjson()``.
+
+    Returns:
+        A ``concurrent.futures.ProcessPoolExecutor``.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(view_definition, parser),
+    )
+
+
+def ordered_results(executor, function, items, max_pending):
+    """Run ``function`` in an executor over a stream, yielding in input order.
+
+    At most ``max_pending`` calls are in flight, so ``items`` is only read
+    as fast as results are consumed.
+
+    Args:
+        executor: A ``concurrent.futures`` executor.
+        function: Picklable function called with the argument of each item.
+        items: Iterable of ``(key, argument)`` pairs. Keys stay in the caller.
+        max_pending: Maximum number of calls in flight.
+
+    Yields:
+        ``(key, result)`` pairs.
+    """
+    pending = deque()
+    try:
+        for key, argument in items:
+            pending.append((key, executor.submit(function, argument)))
+            if len(pending) >= max_pending:
+                key, future = pending.popleft()
+                yield key, future.result()
+        while pending:
+            key, future = pending.popleft()
+            yield key, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def evaluate_worker_lines(lines):
+    """Evaluate NDJSON lines in a ``worker_pool()`` worker.
+
+    Returns the result of ``evaluate_ndjson_lines()`` for the pool's view.
+    """
+    return evaluate_ndjson_lines(_worker_view, lines, _worker_loads)
+
+
+def _init_worker(view_definition, parser):
+    global _worker_view, _worker_loads
+    _worker_view = compile_view(view_definition)
+    _worker_loads = ndjson_loader(parser)
+
+
+def _evaluate_chunk(chunk):
+    # Tuples pickle smaller than dictionaries, rows are materialized in the parent
+    return list(_worker_view.iter_tuples(chunk))
@@ -0,0 +1,102 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+
+# Bumped whenever the layout of a plan or of the artifact changes
+PLAN_CACHE_FORMAT = 1
+
+
+class PlanCache:
+    """A directory of compiled view plans shared between processes.
+
+    Each artifact is a JSON file holding the normalized plan of a view and
+    the fhirpathpy expression tree of every FHIRPath expression in it, so a
+    new process compiling the same view skips normalization and parsing.
+    Files are named by ``view_key()`` and a hash of the artifact format and
+    the sqlonfhir and fhirpathpy versions, so upgrading either library
+    starts a fresh set of files. Unreadable or outdated files are ignored.
+
+    Args:
+        directory: Cache directory, created when the first plan is stored.
+
+    Example:
+        >>> cache = PlanCache("/tmp/sqlonfhir-plans")
+        >>> view = compile_view(view_definition, plan_cache=cache)
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def path(self, key):
+        """Return the file holding the plan of the view with ``view_key()`` key."""
+        return os.path.join(self.directory, f"{key}-{library_tag()}.json")
+
+    def load(self, key):
+        """Return the artifact stored for a view key, or None."""
+        try:
+            with open(self.path(key), encoding="utf-8") as f:
+                artifact = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if artifact.get("tag") != library_tag() or artifact.get("view") != key:
+            return None
+        return artifact
+
+    def store(self, key, plan, where, parsed_paths):
+        """Write the artifact for a view key, replacing any existing file.
+
+        Plans with constants JSON has no type for, such as ``Decimal``
+        values, are not stored and are compiled again by each process.
+        """
+        try:
+            json.dumps(plan.get("constant", ()), default=dict)
+        except TypeError:
+            return
+        artifact = {
+            "tag": library_tag(),
+            "view": key,
+            "plan": plan,
+            "where": where,
+            "paths": parsed_paths,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        write_json_atomic(self.path(key), artifact, separators=(",", ":"), default=dict)
+
+
+def write_json_atomic(path, value, **options):
+    """Write a value as JSON, replacing ``path`` in a single step.
+
+    The JSON is written to a temporary file in the same directory first, so
+    readers never see part of it and an interrupted write keeps the previous
+    file. ``options`` are passed to ``json.dump()``.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f, **options)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+@lru_cache(maxsize=None)
+def library_tag():
+    """Return a hash of the artifact format and the library versions."""
+    # Read from the package metadata, as importing fhirpathpy imports its
+    # parser, which processes loading plans from the cache never use
+    from importlib.metadata import version
+
+    from . import __version__
+
+    text = f"{PLAN_CACHE_FORMAT}:{__version__}:{version('fhirpathpy')}"
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
@@ -0,0 +1,401 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import io
+import json
+import logging
+from collections import deque
+from time import perf_counter
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .ndjson import evaluate_ndjson_lines
+from .sinks import CsvSink, NdjsonSink
+from .sqlonfhir import compile_view
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+}
+
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Bytes read from a request body at a time
+READ_SIZE = 65536
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationService:
+    """A local HTTP service evaluating NDJSON request bodies against views.
+
+    View definitions are registered once and kept compiled. Resources are
+    streamed in as the NDJSON body of a request, evaluated a batch at a
+    time in ``executor`` while the next batch is read, and rows are
+    streamed back as NDJSON or CSV with chunked transfer encoding.
+
+    Endpoints:
+        ``PUT /views/{name}``: register the view definition in the body.
+        ``GET /views``: list the registered views and their columns.
+        ``DELETE /views/{name}``: remove a view.
+        ``POST /views/{name}/evaluate``: evaluate the NDJSON body, returning
+        NDJSON, or CSV with ``?format=csv`` or ``Accept: text/csv``.
+        ``GET /metrics``: request counts, throughput and latency percentiles.
+
+    The status is sent once the first batch has been evaluated, so a body
+    that cannot be parsed or evaluated gets a 400 response with the error.
+    An error after rows have started streaming ends the response with an
+    ``X-Error`` trailer holding the error, and closes the connection.
+
+    Args:
+        views: Optional mapping of view name to view definition.
+        plan_cache: Optional ``PlanCache`` used when compiling views.
+        batch_size: Number of NDJSON lines evaluated per executor call.
+        max_pending: Maximum number of batches being evaluated at once for
+            a request.
+        executor: Optional ``concurrent.futures`` executor, defaults to the
+            event loop's default thread pool.
+
+    Example:
+        >>> service = EvaluationService({"patients": patient_view})
+        >>> server = await service.start("127.0.0.1", 8080)
+        >>> await server.serve_forever()
+    """
+
+    def __init__(
+        self, views=None, plan_cache=None, batch_size=1000, max_pending=2, executor=None
+    ):
+        self.plan_cache = plan_cache
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.executor = executor
+        self.metrics = ServiceMetrics()
+        self.views = {}
+        for name, view_definition in (views or {}).items():
+            self.register(name, view_definition)
+
+    def register(self, name, view_definition):
+        """Compile a view definition and register it under ``name``."""
+        view = compile_view(view_definition, plan_cache=self.plan_cache)
+        self.views[name] = (view_definition, view)
+        return view
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start listening and return the ``asyncio.Server``."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def handle(self, reader, writer):
+        """Serve the HTTP/1.1 requests of a single connection."""
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                if not await self._dispatch(reader, writer, *request):
+                    break
+        except ValueError:
+            # Malformed request line, headers or chunk sizes
+            await _send_json(writer, 400, {"error": REASONS[400]})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # The server is shutting down. This is the outermost frame of the
+            # connection's task, which asyncio would otherwise log as an error.
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader, writer, method, target, headers):
+        # Returns whether the connection can be used for another request
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        if len(parts) == 3 and parts[0] == "views" and parts[2] == "evaluate":
+            if method != "POST":
+                return await self._reject(reader, writer, headers, 405)
+            if parts[1] not in self.views:
+                return await self._reject(reader, writer, headers, 404)
+            output = parse_qs(url.query).get("format", [None])[0]
+            if output is None:
+                accept = headers.get("accept", "")
+                output = "csv" if "text/csv" in accept else "ndjson"
+            if output not in CONTENT_TYPES:
+                return await self._reject(reader, writer, headers, 400)
+            return await self._evaluate(reader, writer, headers, parts[1], output)
+
+        body = b"".join([chunk async for chunk in _body_chunks(reader, headers)])
+        self.metrics.requests += 1
+        if parts == ["metrics"] and method == "GET":
+            status, result = 200, self.metrics.report()
+        elif parts == ["views"] and method == "GET":
+            status, result = (
+                200,
+                {
+                    name: {
+                        "resource": view.resource,
+                        "columns": list(view.column_names),
+                    }
+                    for name, (_, view) in self.views.items()
+                },
+            )
+        elif len(parts) == 2 and parts[0] == "views" and method == "PUT":
+            try:
+                view = self.register(parts[1], json.loads(body))
+            except Exception as e:
+                self.metrics.errors += 1
+                status, result = 400, {"error": str(e)}
+            else:
+                status = 201
+                result = {"name": parts[1], "columns": list(view.column_names)}
+        elif len(parts) == 2 and parts[0] == "views" and method == "DELETE":
+            if self.views.pop(parts[1], None) is None:
+                status, result = 404, {"error": f"Unknown view: {parts[1]}"}
+            else:
+                status, result = 200, {"deleted": parts[1]}
+        elif parts in (["metrics"], ["views"]) or (
+            len(parts) == 2 and parts[0] == "views"
+        ):
+            status, result = 405, {"error": f"{method} not allowed"}
+        else:
+            status, result = 404, {"error": f"Not found: {url.path}"}
+        await _send_json(writer, status, result)
+        return True
+
+    async def _reject(self, reader, writer, headers, status):
+        async for _ in _body_chunks(reader, headers):
+            pass
+        self.metrics.requests += 1
+        self.metrics.errors += 1
+        await _send_json(writer, status, {"error": REASONS[status]})
+        return True
+
+    async def _evaluate(self, reader, writer, headers, name, output):
+        view_definition, view = self.views[name]
+        loop = asyncio.get_running_loop()
+        start = perf_counter()
+        resources = rows = 0
+        pending = deque()
+        started = False
+
+        def write_result(result):
+            # The status is only sent with the first evaluated batch
+            nonlocal started, resources, rows
+            if not started:
+                writer.write(
+                    _head(
+                        200,
+                        CONTENT_TYPES[output],
+                        {"Transfer-Encoding": "chunked", "Trailer": "X-Error"},
+                    )
+                )
+                if output == "csv":
+                    header = io.StringIO()
+                    CsvSink(header).open(view.columns)
+                    _write_chunk(writer, header.getvalue().encode())
+                started = True
+            counts = self._write_result(writer, result)
+            resources, rows = resources + counts[0], rows + counts[1]
+
+        try:
+            async for batch in _line_batches(
+                _body_chunks(reader, headers), self.batch_size
+            ):
+                pending.append(
+                    loop.run_in_executor(
+                        self.executor, _evaluate_lines, view_definition, batch, output
+                    )
+                )
+                if len(pending) >= self.max_pending:
+                    # Not drained while the body is read: clients that send the
+                    # whole body before reading would never read, and block.
+                    write_result(await pending.popleft())
+            while pending:
+                write_result(await pending.popleft())
+                await writer.drain()
+            if not started:
+                write_result((0, 0, b""))
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # The client went away
+            for future in pending:
+                future.cancel()
+            self.metrics.requests += 1
+            self.metrics.errors += 1
+            raise
+        except Exception as e:
+            logger.exception("Evaluating view %s failed", name)
+            for future in pending:
+                future.cancel()
+            self.metrics.requests += 1
+            self.metrics.errors += 1
+            # The rest of the body is not read, so the connection is closed
+            message = " ".join(str(e).split()) or type(e).__name__
+            if not started:
+                await _send_json(
+                    writer, 400, {"error": message}, {"Connection": "close"}
+                )
+            else:
+                trailer = f"0\r\nX-Error: {message}\r\n\r\n"
+                writer.write(trailer.encode("latin-1", "replace"))
+                await writer.drain()
+            return False
+        self.metrics.record(name, resources, rows, perf_counter() - start)
+        return True
+
+    def _write_result(self, writer, result):
+        resources, rows, data = result
+        if data:
+            _write_chunk(writer, data)
+            self.metrics.bytes_out += len(data)
+        return resources, rows
+
+
+class ServiceMetrics:
+    """Counters and request latencies of an ``EvaluationService``.
+
+    Latency percentiles are computed over the last ``window`` evaluation
+    requests. Throughput is averaged over the time since the service started.
+    """
+
+    def __init__(self, window=1000):
+        self.started = perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.resources = 0
+        self.rows = 0
+        self.bytes_out = 0
+        self.latencies = deque(maxlen=window)
+        self.views = {}
+
+    def record(self, view, resources, rows, seconds):
+        self.requests += 1
+        self.resources += resources
+        self.rows += rows
+        self.latencies.append(seconds)
+        stats = self.views.setdefault(
+            view, {"requests": 0, "resources": 0, "rows": 0, "seconds": 0.0}
+        )
+        stats["requests"] += 1
+        stats["resources"] += resources
+        stats["rows"] += rows
+        stats["seconds"] += seconds
+
+    def report(self):
+        uptime = perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        return {
+            "uptime_seconds": uptime,
+            "requests": self.requests,
+            "errors": self.errors,
+            "resources": self.resources,
+            "rows": self.rows,
+            "bytes_out": self.bytes_out,
+            "resources_per_second": self.resources / uptime,
+            "rows_per_second": self.rows / uptime,
+            "latency_seconds": {
+                name: latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+                if latencies
+                else None
+                for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+            },
+            "views": self.views,
+        }
+
+
+async def serve(service, host="127.0.0.1", port=8080):
+    """Run an ``EvaluationService`` until cancelled."""
+    server = await service.start(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def _evaluate_lines(view_definition, lines, output):
+    # Runs in the executor: parse, evaluate and encode one batch of lines.
+    # Compiled views are cached, so this is a lookup after the first batch.
+    view = compile_view(view_definition)
+    resources, columns = evaluate_ndjson_lines(view, lines)
+    buffer = io.StringIO()
+    rows = 0
+    if columns:
+        sink = CsvSink(buffer, header=False) if output == "csv" else NdjsonSink(buffer)
+        sink.open(view.columns)
+        sink.write_columns(columns)
+        rows = len(next(iter(columns.values())))
+    return resources, rows, buffer.getvalue().encode()
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, target, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+async def _body_chunks(reader, headers):
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # Skip any trailers
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    remaining = int(headers.get("content-length", 0))
+    while remaining > 0:
+        chunk = await reader.read(min(READ_SIZE, remaining))
+        if not chunk:
+            raise asyncio.IncompleteReadError(b"", remaining)
+        remaining -= len(chunk)
+        yield chunk
+
+
+async def _line_batches(chunks, batch_size):
+    batch = []
+    # The start of a line continuing in the next chunks, kept in a bytearray
+    # so lines longer than a chunk are not copied again for every chunk
+    rest = bytearray()
+    async for chunk in chunks:
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            rest += chunk
+            continue
+        rest += chunk[:end]
+        batch += bytes(rest).split(b"\n")
+        rest = bytearray(chunk[end + 1 :])
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if rest:
+        batch.append(bytes(rest))
+    if batch:
+        yield batch
+
+
+def _head(status, content_type, headers=None):
+    lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {content_type}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _write_chunk(writer, data):
+    writer.write(b"%x\r\n" % len(data) + data + b"\r\n")
+
+
+async def _send_json(writer, status, result, headers=None):
+    body = json.dumps(result).encode()
+    headers = {"Content-Length": len(body), **(headers or {})}
+    writer.write(_head(status, "application/json", headers) + body)
+    await writer.drain()
@@ -0,0 +1,557 @@
+# Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import csv
+import json
+import os
+import zlib
+from collections import OrderedDict
+from decimal import Decimal
+
+from .memory import approximate_size
+from .sqlonfhir import compile_view, iter_evaluate
+
+# Characters escaped in hive partition directory names, as by Hive and Spark
+HIVE_ESCAPED = frozenset("\"#%'*/:=?\\{[]^")
+HIVE_NULL = "__HIVE_DEFAULT_PARTITION__"
+
+# Arrow types for SQL on FHIR column types. Columns without a declared type
+# are written as strings.
+ARROW_TYPES = {
+    "boolean": "bool_",
+    "integer": "int64",
+    "integer64": "int64",
+    "positiveInt": "int64",
+    "unsignedInt": "int64",
+    "decimal": "decimal128",
+}
+
+# Arguments of parametrized Arrow types. Decimals get 20 integer and 18
+# fractional digits, FHIR decimals with more fractional digits are rejected.
+ARROW_TYPE_ARGS = {"decimal128": (38, 18)}
+
+
+def evaluate_to(
+    resources,
+    view_definition,
+    sink,
+    batch_size=10000,
+    workers=None,
+    memory_budget=None,
+):
+    """Evaluate FHIR resources against a view definition and write to a sink.
+
+    Rows are handed to the sink in batches as they are produced, so writing
+    overlaps with evaluation and memory use is bounded by the batch size.
+    Without workers or a memory budget, batches are evaluated column by
+    column by ``CompiledView.iter_batches()`` and passed to
+    ``Sink.write_columns()``.
+
+    Args:
+        resources: Iterable of FHIR resource dictionaries to process.
+        view_definition: SQL on FHIR view definition specifying how to
+            extract data from the resources.
+        sink: Output sink such as ``ParquetSink``, ``CsvSink`` or
+            ``NdjsonSink``. The sink is closed when evaluation finishes.
+        batch_size: Number of resources evaluated, or rows passed to the
+            sink when using workers or a memory budget, at a time.
+        workers: Optional number of worker processes, as for ``evaluate()``.
+        memory_budget: Optional ``MemoryBudget``. Rows buffered by the
+            evaluator, the current batch and the sink are counted against it.
+            Batches are passed to the sink early once it is exceeded.
+
+    Returns:
+        The number of rows written.
+
+    Example:
+        >>> evaluate_to(read_ndjson("Patient.ndjson"), view, ParquetSink("patient.parquet"))
+        1042
+    """
+    view = compile_view(view_definition)
+    sink.memory_budget = memory_budget
+    sink.open(view.columns)
+    count = 0
+    try:
+        if memory_budget is None and (workers is None or workers <= 1):
+            for columns in view.iter_batches(resources, batch_size):
+                sink.write_columns(columns)
+                count += len(next(iter(columns.values())))
+            return count
+        batch = []
+        batch_bytes = 0
+        for row in iter_evaluate(resources, view_definition, workers, memory_budget):
+            batch.append(row)
+            if memory_budget is not None:
+                nbytes = approximate_size(row)
+                memory_budget.reserve(nbytes)
+                batch_bytes += nbytes
+            if len(batch) >= batch_size or (
+                memory_budget is not None and memory_budget.exceeded()
+            ):
+                sink.write_batch(batch)
+                count += len(batch)
+                batch = []
+                if memory_budget is not None:
+                    memory_budget.release(batch_bytes)
+                    batch_bytes = 0
+        if batch:
+            sink.write_batch(batch)
+            count += len(batch)
+            if memory_budget is not None:
+                memory_budget.release(batch_bytes)
+    finally:
+        sink.close()
+    return count
+
+
+class Sink:
+    """Base class for evaluation output sinks.
+
+    ``open()`` is called once with the view's column definitions, followed by
+    any number of ``write_batch()`` or ``write_columns()`` calls and finally
+    ``close()``. Sinks that buffer rows count them against ``memory_budget``,
+    set by ``evaluate_to()``, when there is one.
+    """
+
+    memory_budget = None
+
+    def open(self, columns):
+        self.columns = list(columns)
+
+    def write_batch(self, rows):
+        raise NotImplementedError
+
+    def write_columns(self, columns):
+        """Write a ``{column_name: values}`` batch, by default as rows."""
+        names = list(columns)
+        self.write_batch([dict(zip(names, row)) for row in zip(*columns.values())])
+
+    def close(self):
+        pass
+
+
+class NdjsonSink(Sink):
+    """Write rows as newline delimited JSON.
+
+    Args:
+        path: Output file path or an open text file object.
+    """
+
+    extension = ".ndjson"
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def open(self, columns):
+        super().open(columns)
+        self.file, self._owns_file = _open_text(self.path)
+
+    def write_batch(self, rows):
+        self.file.writelines(json_dumps(row) + "\n" for row in rows)
+        self.file.flush()
+
+    def close(self):
+        _close_text(self.file, self._owns_file)
+        self.file = None
+
+
+class CsvSink(Sink):
+    """Write rows as CSV with a header row taken from the view's columns.
+
+    Nulls are written as empty fields, booleans as ``true``/``false`` and
+    collection or complex values as JSON.
+
+    Args:
+        path: Output file path or an open text file object.
+        header: Whether to write the header row, off when appending.
+        **fmtparams: Extra formatting parameters passed to ``csv.writer``.
+    """
+
+    extension = ".csv"
+
+    def __init__(self, path, header=True, **fmtparams):
+        self.path = path
+        self.header = header
+        self.fmtparams = fmtparams
+        self.file = None
+
+    def open(self, columns):
+        super().open(columns)
+        self.file, self._owns_file = _open_text(self.path, newline="")
+        self.writer = csv.writer(self.file, **self.fmtparams)
+        self.names = [column["name"] for column in self.columns]
+        if self.header:
+            self.writer.writerow(self.names)
+
+    def write_batch(self, rows):
+        self.writer.writerows(
+            [csv_value(row.get(name)) for name in self.names] for row in rows
+        )
+        self.file.flush()
+
+    def close(self):
+        _close_text(self.file, self._owns_file)
+        self.file = None
+
+
+class ParquetSink(Sink):
+    """Write rows to a Parquet file, one row group at a time.
+
+    The Arrow schema is derived from the view's column definitions. Columns
+    marked ``collection`` become list columns, and ``decimal`` columns
+    ``decimal128(38, 18)`` columns. Columns without a numeric or boolean
+    ``type`` are written as strings, with complex values encoded as JSON.
+    Requires the optional ``pyarrow`` dependency.
+
+    Args:
+        path: Output file path.
+        row_group_size: Number of rows buffered before a row group is written.
+        **writer_options: Extra options passed to ``pyarrow.parquet.ParquetWriter``.
+    """
+
+    extension = ".parquet"
+
+    def __init__(self, path, row_group_size=100000, **writer_options):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.writer_options = writer_options
+        self.writer = None
+
+    def open(self, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required for ParquetSink") from None
+
+        super().open(columns)
+        self.pa = pa
+        self.schema = arrow_schema(self.columns, pa)
+        self.writer = pq.ParquetWriter(self.path, self.schema, **self.writer_options)
+        # Rows waiting for the next row group, held as one list per column
+        self.pending = [[] for _ in self.columns]
+        self.pending_rows = 0
+        self.pending_bytes = 0
+
+    def write_batch(self, rows):
+        self.write_columns(
+            {
+                column["name"]: [row.get(column["name"]) for row in rows]
+                for column in self.columns
+            }
+        )
+
+    def write_columns(self, columns):
+        count = 0
+        for column, pending in zip(self.columns, self.pending):
+            values = columns[column["name"]]
+            pending += values
+            count = len(values)
+            if self.memory_budget is not None:
+                nbytes = sum(approximate_size(value) for value in values)
+                self.memory_budget.reserve(nbytes)
+                self.pending_bytes += nbytes
+        self.pending_rows += count
+        while self.pending_rows >= self.row_group_size:
+            size = self.row_group_size
+            self._write_row_group([pending[:size] for pending in self.pending])
+            self.pending = [pending[size:] for pending in self.pending]
+            if self.memory_budget is not None:
+                nbytes = self.pending_bytes * size // self.pending_rows
+                self.memory_budget.release(nbytes)
+                self.pending_bytes -= nbytes
+            self.pending_rows -= size
+        # Over budget, the pending rows are written as a smaller row group
+        if self.memory_budget is not None and self.memory_budget.exceeded():
+            self._flush()
+
+    def close(self):
+        if self.writer is None:
+            return
+        self._flush()
+        self.writer.close()
+        self.writer = None
+
+    def _flush(self):
+        if self.pending_rows:
+            self._write_row_group(self.pending)
+            self.pending = [[] for _ in self.columns]
+            self.pending_rows = 0
+        if self.memory_budget is not None:
+            self.memory_budget.release(self.pending_bytes)
+        self.pending_bytes = 0
+
+    def _write_row_group(self, columns):
+        arrays = []
+        for column, field, values in zip(self.columns, self.schema, columns):
+            values = [_arrow_value(value, column) for value in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+
+class PartitionedSink(Sink):
+    """Route rows to one file per partition in a hive-style directory layout.
+
+    Each row is assigned to a partition by the values of ``partition_by`` and
+    written below ``directory/name=value/...``, so engines such as Spark and
+    DuckDB can skip partitions when reading. Rows are buffered per partition
+    and written in batches. At most ``max_open_files`` partition files are
+    open at once; when another one is needed the least recently written file
+    is closed, and a partition that receives rows again continues in a new
+    part file. Existing files with the same names are replaced.
+
+    Args:
+        directory: Root directory of the output.
+        partition_by: Mapping of partition name to a column name, or to a
+            function of the row dictionary such as ``hash_bucket()`` or
+            ``value_prefix()``. Partition names must not be column names, as
+            readers add them to the rows.
+        sink_factory: Function creating the sink for a file path, such as
+            ``ParquetSink``, ``CsvSink`` or ``NdjsonSink``.
+        extension: File name extension, defaults to the ``extension`` of
+            ``sink_factory``.
+        max_open_files: Maximum number of partition files open at once.
+        buffer_rows: Number of rows buffered for a partition before they are
+            written.
+        max_buffered_rows: Number of rows buffered across all partitions
+            before the largest partition buffer is written.
+
+    Example:
+        >>> sink = PartitionedSink(
+        ...     "observations/",
+        ...     {"month": value_prefix("effective", 7), "bucket": hash_bucket("patient", 256)},
+        ...     sink_factory=ParquetSink,
+        ... )
+        >>> evaluate_to(read_ndjson("Observation.ndjson"), view, sink)
+    """
+
+    def __init__(
+        self,
+        directory,
+        partition_by,
+        sink_factory=NdjsonSink,
+        extension=None,
+        max_open_files=64,
+        buffer_rows=10000,
+        max_buffered_rows=100000,
+    ):
+        self.directory = directory
+        self.partition_by = {
+            name: (lambda row, column=spec: row.get(column))
+            if isinstance(spec, str)
+            else spec
+            for name, spec in partition_by.items()
+        }
+        self.sink_factory = sink_factory
+        self.extension = (
+            getattr(sink_factory, "extension", "") if extension is None else extension
+        )
+        self.max_open_files = max_open_files
+        self.buffer_rows = buffer_rows
+        self.max_buffered_rows = max_buffered_rows
+        self.files_written = 0
+        self.sinks = None
+
+    def open(self, columns):
+        super().open(columns)
+        clashes = self.partition_by.keys() & {column["name"] for column in columns}
+        if clashes:
+            raise Exception(f"Partition names are also column names: {sorted(clashes)}")
+        # Partition values -> relative directory, pending rows and part count
+        self.paths = {}
+        self.pending = {}
+        self.pending_bytes = {}
+        self.parts = {}
+        self.buffered = 0
+        # Open sinks by partition values, least recently written first
+        self.sinks = OrderedDict()
+
+    def write_batch(self, rows):
+        functions = list(self.partition_by.values())
+        for row in rows:
+            values = tuple(function(row) for function in functions)
+            pending = self.pending.get(values)
+            if pending is None:
+                pending = self.pending[values] = []
+                self.pending_bytes[values] = 0
+            pending.append(row)
+            if self.memory_budget is not None:
+                nbytes = approximate_size(row)
+                self.memory_budget.reserve(nbytes)
+                self.pending_bytes[values] += nbytes
+            self.buffered += 1
+            if len(pending) >= self.buffer_rows:
+                self._flush(values)
+            elif self.buffered > self.max_buffered_rows or (
+                self.memory_budget is not None and self.memory_budget.exceeded()
+            ):
+                self._flush(max(self.pending, key=lambda key: len(self.pending[key])))
+
+    def close(self):
+        if self.sinks is None:
+            return
+        try:
+            for values in list(self.pending):
+                self._flush(values)
+        finally:
+            for sink in self.sinks.values():
+                sink.close()
+            self.sinks = None
+
+    def _flush(self, values):
+        rows = self.pending.pop(values)
+        if self.memory_budget is not None:
+            self.memory_budget.release(self.pending_bytes[values])
+        del self.pending_bytes[values]
+        self.buffered -= len(rows)
+        if not rows:
+            return
+        sink = self.sinks.get(values)
+        if sink is None:
+            sink = self._open_partition(values)
+        else:
+            self.sinks.move_to_end(values)
+        sink.write_batch(rows)
+
+    def _open_partition(self, values):
+        if len(self.sinks) >= self.max_open_files:
+            _, oldest = self.sinks.popitem(last=False)
+            oldest.close()
+        directory = self.paths.get(values)
+        if directory is None:
+            directory = self.paths[values] = os.path.join(
+                self.directory,
+                *(
+                    f"{_hive_escape(name)}={_hive_escape(value)}"
+                    for name, value in zip(self.partition_by, values)
+                ),
+            )
+            os.makedirs(directory, exist_ok=True)
+        part = self.parts.get(values, 0)
+        self.parts[values] = part + 1
+        sink = self.sink_factory(
+            os.path.join(directory, f"part-{part:05d}{self.extension}")
+        )
+        sink.memory_budget = self.memory_budget
+        sink.open(self.columns)
+        self.sinks[values] = sink
+        self.files_written += 1
+        return sink
+
+
+def hash_bucket(column, buckets):
+    """Return a ``partition_by`` function hashing a column into ``buckets`` buckets.
+
+    The hash is stable across processes and Python versions, so a key such
+    as the one from ``getResourceKey()`` always lands in the same bucket.
+    Nulls are not assigned a bucket.
+    """
+
+    def bucket(row):
+        value = row.get(column)
+        if value is None:
+            return None
+        return zlib.crc32(str(value).encode()) % buckets
+
+    return bucket
+
+
+def value_prefix(column, length):
+    """Return a ``partition_by`` function taking the first characters of a column.
+
+    For example ``value_prefix("effective", 7)`` partitions by month of a
+    date or dateTime column, as in ``2024-03``.
+    """
+
+    def prefix(row):
+        value = row.get(column)
+        return None if value is None else str(value)[:length]
+
+    return prefix
+
+
+def arrow_schema(columns, pa):
+    """Build an Arrow schema from SQL on FHIR column definitions."""
+    fields = []
+    for column in columns:
+        name = ARROW_TYPES.get(column.get("type"), "string")
+        value_type = getattr(pa, name)(*ARROW_TYPE_ARGS.get(name, ()))
+        if column.get("collection"):
+            value_type = pa.list_(value_type)
+        fields.append(pa.field(column["name"], value_type))
+    return pa.schema(fields)
+
+
+def _arrow_value(value, column):
+    if value is None:
+        return None
+    if column.get("collection"):
+        return [_arrow_scalar(item, column.get("type")) for item in value]
+    return _arrow_scalar(value, column.get("type"))
+
+
+def _arrow_scalar(value, type):
+    if type not in ARROW_TYPES:
+        return value if isinstance(value, str) else json_dumps(value)
+    if type == "decimal" and isinstance(value, float):
+        return Decimal(repr(value))
+    return value
+
+
+def csv_value(value):
+    """Return a value as written to a CSV field by ``CsvSink``."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, dict)):
+        return json_dumps(value)
+    return value
+
+
+def json_dumps(value):
+    """Return ``json.dumps(value)`` with Decimal values as exact number literals."""
+    # Values without decimals take the C encoder, others are encoded piece
+    # by piece
+    try:
+        return json.dumps(value)
+    except TypeError:
+        pass
+    if isinstance(value, Decimal):
+        return str(value) if value.is_finite() else json.dumps(float(value))
+    if isinstance(value, dict):
+        return (
+            "{"
+            + ", ".join(
+                f"{json.dumps(str(key))}: {json_dumps(item)}"
+                for key, item in value.items()
+            )
+            + "}"
+        )
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(json_dumps(item) for item in value) + "]"
+    return json.dumps(value)
+
+
+def _hive_escape(value):
+    # Spark writes empty strings to the null partition too
+    if value is None or value == "":
+        return HIVE_NULL
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    return "".join(
+        f"%{ord(char):02X}" if char in HIVE_ESCAPED or ord(char) < 32 else char
+        for char in str(value)
+    )
+
+
+def _open_text(path, **kwargs):
+    if hasattr(path, "write"):
+        return path, False
+    return open(path, "w", encoding="utf-8", **kwargs), True
+
+
+def _close_text(file, owns_file):
+    if file is not None and owns_file:
+        file.close()
@@ -1,24 +1,48 @@
 # Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
-from fhirpathpy import compile
-from fhirpathpy.models import models
+import hashlib
+import json
+from collections import Counter
+from decimal import Decimal
+from functools import lru_cache
+from types import MappingProxyType
 
+from .fastpath import compile_fast_path, evaluate_batch, required_literals
 
-def evaluate(resources, view_definition):
+# Maximum number of compiled FHIRPath expressions shared across all views in
+# the process.
+FHIRPATH_CACHE_SIZE = 1024
+
+# Maximum number of compiled views kept by compile_view(), keyed by view_key()
+VIEW_CACHE_SIZE = 256
+_compiled_views = {}
+
+
+def evaluate(
+    resources, view_definition, workers=None, output="rows", memory_budget=None
+):
     """Evaluate FHIR resources against a SQL on FHIR view definition.
 
     Processes a list of FHIR resources and transforms into tabular data based
     on the provided view definition.
 
     Args:
-        resources: List of FHIR resource dictionaries to process.
+        resources: Iterable of FHIR resource dictionaries to process.
         view_definition: SQL on FHIR view definition specifying how to
             extract data from the resources.
+        workers: Optional number of worker processes. When greater than one
+            the resources are evaluated in parallel by ``ParallelEvaluator``.
+        output: ``"rows"`` to return a list of row dictionaries, or
+            ``"columnar"`` to return a ``ColumnarResult`` holding one buffer
+            per column.
+        memory_budget: Optional ``MemoryBudget`` limiting the rows buffered
+            while evaluating, see ``compile_view()``.
 
     Returns:
         List of dictionaries representing extracted tabular data where
-        each dictionary represents a row with column name/value pairs.
+        each dictionary represents a row with column name/value pairs, or a
+        ``ColumnarResult`` when ``output="columnar"``.
 
     Example:
         >>> resources = [{"resourceType": "Patient", "id": "123"}]
@@ -26,115 +50,620 @@ def evaluate(resources, view_definition):
         >>> evaluate(resources, view)
         [{"id": "123"}]
     """
+    if output == "rows":
+        return list(iter_evaluate(resources, view_definition, workers, memory_budget))
+    elif output == "columnar":
+        from .columnar import ColumnarResult
+
+        if workers is not None and workers > 1:
+            from .parallel import ParallelEvaluator
+
+            if memory_budget is not None:
+                raise Exception("memory_budget is not supported with workers")
+            view = compile_view(view_definition)
+            rows = ParallelEvaluator(view_definition, workers).iter_tuples(resources)
+            result = ColumnarResult(view.columns)
+            result.extend_tuples(rows, view.column_names)
+            return result
+        view = compile_view(view_definition, memory_budget=memory_budget)
+        result = ColumnarResult(view.columns)
+        for columns in view.iter_batches(resources):
+            result.extend_columns(columns)
+        return result
+    raise Exception(f"Unknown output format: {output}")
+
+
+def iter_evaluate(resources, view_definition, workers=None, memory_budget=None):
+    """Lazily evaluate FHIR resources against a SQL on FHIR view definition.
+
+    Rows are yielded one at a time as each resource is processed, so neither
+    the input nor the output needs to be held in memory. Any iterable of
+    resources is accepted, including generators such as ``read_ndjson()``.
+
+    Args:
+        resources: Iterable of FHIR resource dictionaries to process.
+        view_definition: SQL on FHIR view definition specifying how to
+            extract data from the resources.
+        workers: Optional number of worker processes. When greater than one
+            the resources are evaluated in parallel by ``ParallelEvaluator``.
+        memory_budget: Optional ``MemoryBudget`` limiting the rows buffered
+            while evaluating, see ``compile_view()``.
+
+    Yields:
+        Dictionaries representing a row with column name/value pairs.
+
+    Example:
+        >>> view = {"resource": "Patient", "column": [{"name": "id", "path": "id"}]}
+        >>> for row in iter_evaluate(read_ndjson("Patient.ndjson"), view):
+        ...     print(row)
+    """
 
-    if len(resources) == 0:
-        return []
+    if workers is not None and workers > 1:
+        from .parallel import ParallelEvaluator
 
-    if "resource" not in view_definition:
-        raise Exception("View Definition is missing resource type.")
+        if memory_budget is not None:
+            raise Exception("memory_budget is not supported with workers")
+        yield from ParallelEvaluator(view_definition, workers).iter_rows(resources)
+        return
+
+    yield from compile_view(view_definition, memory_budget=memory_budget).iter_rows(
+        resources
+    )
+
+
+def evaluate_many(resources, view_definitions):
+    """Evaluate many view definitions in a single pass over the resources.
+
+    Views are grouped by their resource type, so each resource is read once
+    and only handed to the views that apply to it.
+
+    Args:
+        resources: Iterable of FHIR resource dictionaries to process.
+        view_definitions: Mapping of view name to a SQL on FHIR view
+            definition or a ``CompiledView``.
+
+    Yields:
+        ``(view_name, row)`` tuples in resource order. Rows for a single
+        resource are yielded in the order the views were given.
+
+    Example:
+        >>> views = {"patients": patient_view, "observations": observation_view}
+        >>> for name, row in evaluate_many(read_ndjson("export.ndjson"), views):
+        ...     tables[name].append(row)
+    """
+    views_by_type = {}
+    for name, view in view_definitions.items():
+        if not isinstance(view, CompiledView):
+            view = compile_view(view)
+        views_by_type.setdefault(view.resource, []).append((name, view))
 
-    constants = view_definition.get("constant", [])
-    norm = normalize(view_definition, constants)
-    result = []
-    evaluator = ViewDefinitionEvaluator()
     for resource in resources:
-        if (
-            "resourceType" not in resource
-            or resource["resourceType"] != view_definition["resource"]
-        ):
+        views = views_by_type.get(resource.get("resourceType"))
+        if views is None:
             continue
-        result += evaluator.call_fn(norm, resource)
-    return result
+        for name, view in views:
+            for row in view.resource_rows(resource):
+                yield name, row
+
+
+def compile_view(view_definition, profiler=None, memory_budget=None, plan_cache=None):
+    """Compile a SQL on FHIR view definition for repeated evaluation.
+
+    The view definition is normalized once and every FHIRPath expression it
+    contains is compiled up front, so the returned view can be evaluated
+    against many batches of resources without paying the setup cost again.
+    Compiled views are cached by a hash of the view definition, so compiling
+    an equal view definition again returns the same ``CompiledView``.
+
+    Args:
+        view_definition: SQL on FHIR view definition specifying how to
+            extract data from the resources.
+        profiler: Optional ``Profiler`` that records per node and per
+            expression statistics while the view is evaluated.
+        memory_budget: Optional ``MemoryBudget``. The rows a ``select``
+            materializes are counted against it, and spilled to temporary
+            files once it is exceeded.
+        plan_cache: Optional ``PlanCache``. The plan and parsed expressions
+            are read from it when another process already compiled an equal
+            view definition, and stored in it otherwise.
+
+    Returns:
+        An immutable ``CompiledView``.
+
+    Example:
+        >>> view = compile_view({"resource": "Patient", "column": [{"name": "id", "path": "id"}]})
+        >>> view.evaluate([{"resourceType": "Patient", "id": "123"}])
+        [{"id": "123"}]
+    """
+    if profiler is not None or memory_budget is not None:
+        return CompiledView(view_definition, profiler, memory_budget, plan_cache)
+
+    key = view_key(view_definition)
+    compiled = _compiled_views.get(key)
+    if compiled is None:
+        compiled = CompiledView(view_definition, plan_cache=plan_cache)
+        if len(_compiled_views) >= VIEW_CACHE_SIZE:
+            _compiled_views.pop(next(iter(_compiled_views)), None)
+        _compiled_views[key] = compiled
+    elif plan_cache is not None and key not in plan_cache:
+        # Compiled earlier in this process without the cache
+        compiled._store_plan(plan_cache, key)
+    return compiled
+
+
+class CompiledView:
+    """A normalized view definition with all FHIRPath expressions compiled.
+
+    Instances are created by ``compile_view()`` and cannot be modified.
+    Internally rows are tuples laid out as ``column_names``. ``iter_tuples()``
+    returns them as is, ``iter_batches()`` returns them as column vectors and
+    the other methods return row dictionaries.
+    """
+
+    __slots__ = (
+        "resource",
+        "columns",
+        "column_names",
+        "required_literals",
+        "_plan",
+        "_where",
+        "_vector_columns",
+        "_evaluator",
+    )
+
+    def __init__(
+        self, view_definition, profiler=None, memory_budget=None, plan_cache=None
+    ):
+        if "resource" not in view_definition:
+            raise Exception("View Definition is missing resource type.")
+
+        artifact = None
+        if plan_cache is not None:
+            key = view_key(view_definition)
+            artifact = plan_cache.load(key)
+        if artifact is None:
+            plan, where = plan_view(view_definition)
+            parsed_paths = {}
+        else:
+            plan, where = freeze(artifact["plan"]), freeze(artifact["where"])
+            parsed_paths = artifact["paths"]
+        variables = constant_variables(view_definition.get("constant", []))
+        evaluator = ViewDefinitionEvaluator(profiler, variables, memory_budget)
+        evaluator.compile_paths(plan, parsed_paths)
+        evaluator.compile_paths({"where": where}, parsed_paths)
+        column_names = evaluator.compile_schema(plan)
+        if profiler is not None:
+            profiler.attach(plan)
+        else:
+            # Profiled views keep every expression separate so each is timed
+            evaluator.share_prefixes(plan, where)
+
+        object.__setattr__(self, "resource", view_definition["resource"])
+        object.__setattr__(self, "columns", tuple(get_column_definitions(plan)))
+        object.__setattr__(self, "column_names", column_names)
+        object.__setattr__(
+            self,
+            "required_literals",
+            tuple(
+                literal
+                for where_clause in where
+                for literal in required_literals(
+                    evaluator.fhirpath_cache[where_clause["path"]].parsedPath,
+                    variables,
+                )
+            ),
+        )
+        object.__setattr__(self, "_plan", plan)
+        object.__setattr__(self, "_where", where)
+        object.__setattr__(self, "_vector_columns", vector_columns(plan))
+        object.__setattr__(self, "_evaluator", evaluator)
+        if plan_cache is not None and artifact is None:
+            self._store_plan(plan_cache, key)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledView is immutable")
+
+    def _store_plan(self, plan_cache, key):
+        plan_cache.store(
+            key,
+            self._plan,
+            self._where,
+            {
+                path: fn.parsedPath
+                for path, fn in self._evaluator.fhirpath_cache.items()
+            },
+        )
+
+    def iter_rows(self, resources):
+        """Lazily evaluate resources against the view, yielding one row at a time."""
+        names = self.column_names
+        for row in self.iter_tuples(resources):
+            yield dict(zip(names, row))
+
+    def iter_tuples(self, resources):
+        """Like ``iter_rows()``, but yield rows as tuples ordered as ``column_names``."""
+        for resource in self._of_type(resources):
+            yield from self._resource_tuples(resource)
+
+    def iter_batches(self, resources, batch_size=10000):
+        """Evaluate resources a batch at a time, yielding column vectors.
+
+        Views made only of columns, possibly grouped by ``select``, are
+        evaluated column by column, applying each expression across the whole
+        batch in one loop. Other views are evaluated row by row and the rows
+        transposed.
+
+        Args:
+            resources: Iterable of FHIR resource dictionaries.
+            batch_size: Number of resources evaluated at a time.
+
+        Yields:
+            Dictionaries of column name to a list of values, one per row.
+            Batches without rows are not yielded.
+        """
+        names = self.column_names
+        batch = []
+        for resource in self._of_type(resources):
+            batch.append(resource)
+            if len(batch) >= batch_size:
+                vectors = self._batch_vectors(batch)
+                if vectors and vectors[0]:
+                    yield dict(zip(names, vectors))
+                batch = []
+        if batch:
+            vectors = self._batch_vectors(batch)
+            if vectors and vectors[0]:
+                yield dict(zip(names, vectors))
+
+    def resource_rows(self, resource):
+        """Yield the rows for a single resource already known to match the view."""
+        names = self.column_names
+        for row in self._resource_tuples(resource):
+            yield dict(zip(names, row))
+
+    def _resource_tuples(self, resource):
+        self._evaluator.reset_memos()
+        # Root where clauses are checked before anything else is evaluated
+        if self._where and not self._evaluator.matches(resource, self._where):
+            if self._evaluator.profiler is not None:
+                self._evaluator.profiler.resources_filtered += 1
+            return ()
+        return self._evaluator.call_fn(self._plan, resource)
+
+    def _of_type(self, resources):
+        profiler = self._evaluator.profiler
+        for resource in resources:
+            if (
+                "resourceType" not in resource
+                or resource["resourceType"] != self.resource
+            ):
+                if profiler is not None:
+                    profiler.resources_skipped += 1
+                continue
+            yield resource
+
+    def _batch_vectors(self, batch):
+        evaluator = self._evaluator
+        # Profiled views keep to the row by row path so every node is timed
+        if self._vector_columns is None or evaluator.profiler is not None:
+            rows = [
+                row for resource in batch for row in self._resource_tuples(resource)
+            ]
+            if not rows:
+                return [[] for _ in self.column_names]
+            return [list(values) for values in zip(*rows)]
+        # Each column is evaluated across the batch in turn, so every
+        # resource keeps its memo of shared prefixes until the batch is done
+        memos = None if evaluator.memos is None else [{} for _ in batch]
+        if self._where:
+            kept = []
+            for index, resource in enumerate(batch):
+                if memos is not None:
+                    evaluator.reset_memos(resource, memos[index])
+                if evaluator.matches(resource, self._where):
+                    kept.append(index)
+            if len(kept) < len(batch):
+                batch = [batch[index] for index in kept]
+                if memos is not None:
+                    memos = [memos[index] for index in kept]
+            evaluator.reset_memos()
+        return [
+            evaluator.column_vector(column, batch, memos)
+            for column in self._vector_columns
+        ]
+
+    def evaluate(self, resources):
+        """Evaluate resources against the view and return a list of rows."""
+        return list(self.iter_rows(resources))
+
+
+@lru_cache(maxsize=FHIRPATH_CACHE_SIZE)
+def compile_fhirpath(path):
+    """Compile a FHIRPath expression, sharing the result across the process.
+
+    Simple navigation expressions are compiled to plain Python by
+    ``compile_fast_path()``, everything else is evaluated by fhirpathpy.
+    """
+    # fhirpathpy is imported on first use, which keeps importing sqlonfhir
+    # cheap for processes that load their plans from a PlanCache
+    from fhirpathpy.parser import parse
+
+    return compile_parsed_fhirpath(parse(path))
+
+
+def compile_parsed_fhirpath(parsed_path):
+    """Compile an expression tree produced by the fhirpathpy parser."""
+    interpreter = None
+
+    def fallback(resource, context=None):
+        # Built on first use, so fast path expressions loaded from a
+        # PlanCache never import fhirpathpy
+        nonlocal interpreter
+        if interpreter is None:
+            interpreter = interpret_parsed_fhirpath(parsed_path)
+        return interpreter(resource, context)
+
+    return compile_fast_path(parsed_path, fallback) or interpret_parsed_fhirpath(
+        parsed_path
+    )
+
+
+def interpret_parsed_fhirpath(parsed_path):
+    from fhirpathpy import apply_parsed_path
+    from fhirpathpy.engine.util import set_paths
+    from fhirpathpy.models import models
+
+    # The object fhirpathpy.compile() returns, without parsing the path again
+    return set_paths(
+        apply_parsed_path,
+        parsedPath=parsed_path,
+        model=models["r4"],
+        options={"userInvocationTable": USER_INVOCATION_TABLE},
+    )
 
 
 # View Definition Evaluation
 class ViewDefinitionEvaluator:
-    def __init__(self):
+    def __init__(self, profiler=None, variables=None, memory_budget=None):
         self.fhirpath_cache = {}
-        self.user_invocation_table = {
-            "getReferenceKey": {
-                "fn": self.get_reference_key,
-                "arity": {0: [], 1: ["Identifier"]},
-            },
-            "getResourceKey": {"fn": self.get_resource_key},
-            "identity": {"fn": self.identity},
-        }
+        self.user_invocation_table = USER_INVOCATION_TABLE
+        # Values of the view's constants, passed to FHIRPath as %name
+        self.variables = variables or {}
+        self.null_rows = {}
+        self.union_orders = {}
+        self.profiler = profiler
+        self.memory_budget = memory_budget
+        # Per thread memos of shared prefixes, see share_prefixes()
+        self.memos = None
+        if memory_budget is not None:
+            self.select = self.select_within_budget
+        if profiler is not None:
+            # Instance attributes shadow the methods, so unprofiled evaluators
+            # keep the plain code path
+            self.call_fn = profiler.wrap_call_fn(self.call_fn)
+            self.eval_fhirpath = profiler.wrap_eval_fhirpath(self.eval_fhirpath)
 
     def eval_fhirpath(self, resource, path):
         if path not in self.fhirpath_cache:
-            self.fhirpath_cache[path] = compile(
-                path,
-                model=models["r4"],
-                options={"userInvocationTable": self.user_invocation_table},
+            self.fhirpath_cache[path] = compile_fhirpath(path)
+
+        return self.fhirpath_cache[path](resource, self.variables)
+
+    def compile_paths(self, expr, parsed_paths=None):
+        # parsed_paths holds expression trees already parsed, e.g. by a PlanCache
+        paths = [expr[key] for key in ("forEach", "forEachOrNull") if key in expr]
+        for clause in (*expr.get("where", ()), *expr.get("column", ())):
+            paths.append(clause["path"])
+        for path in paths:
+            if parsed_paths and path in parsed_paths:
+                self.fhirpath_cache[path] = compile_parsed_fhirpath(parsed_paths[path])
+            elif self.profiler is not None:
+                before = compile_fhirpath.cache_info()
+                self.fhirpath_cache[path] = compile_fhirpath(path)
+                self.profiler.record_compile(
+                    path, before, compile_fhirpath.cache_info()
+                )
+            else:
+                self.fhirpath_cache[path] = compile_fhirpath(path)
+        for selection in (*expr.get("select", ()), *expr.get("unionAll", ())):
+            self.compile_paths(selection, parsed_paths)
+
+    def share_prefixes(self, plan, where=()):
+        """Evaluate leading steps shared by several expressions once per focus.
+
+        The expressions of a view are grouped by the focus they are evaluated
+        on, the resource or a forEach item. Within a group, the items reached
+        after steps that several fast path expressions start with, such as
+        ``code.coding.where(system = 'http://loinc.org')``, are kept in a memo
+        for the focus and reused by the other expressions. The memos belong to
+        the resource started by ``reset_memos()`` and are replaced as the
+        focus moves to other resources or items.
+        """
+        scopes = [[clause["path"] for clause in where]]
+        focus_scopes(plan, scopes[0], scopes)
+        cuts = {}
+        prefix_keys = {}
+        for scope in scopes:
+            steps = [
+                getattr(self.fhirpath_cache[path], "steps", None) for path in scope
+            ]
+            counts = Counter(
+                path_steps[:k]
+                for path_steps in steps
+                if path_steps
+                for k in range(1, len(path_steps) + 1)
+            )
+            for path, path_steps in zip(scope, steps):
+                if not path_steps:
+                    continue
+                # Memos are kept where fewer expressions share the next step.
+                # A single step costs less to evaluate than to look up.
+                for k in range(2, len(path_steps) + 1):
+                    prefix = path_steps[:k]
+                    if counts[prefix] > 1 and (
+                        k == len(path_steps)
+                        or counts[path_steps[: k + 1]] < counts[prefix]
+                    ):
+                        key = prefix_keys.setdefault(prefix, len(prefix_keys))
+                        cuts.setdefault(path, set()).add((k, key))
+        if not cuts:
+            return
+        import threading
+
+        self.memos = threading.local()
+        for path, path_cuts in cuts.items():
+            self.fhirpath_cache[path] = shared_fhirpath(
+                self.fhirpath_cache[path], tuple(sorted(path_cuts)), self.memos
             )
 
-        return self.fhirpath_cache[path](resource)
+    def reset_memos(self, resource=None, memo=None):
+        # Starts the memos of shared prefixes for a new resource, optionally
+        # with the memo to use for it
+        if self.memos is not None:
+            self.memos.focus = resource
+            self.memos.memo = {} if memo is None else memo
+
+    def compile_schema(self, expr):
+        """Return the column names of the rows produced by a node.
+
+        Rows are tuples laid out in this order. The schema is computed once
+        per node, along with the row of nulls used by forEachOrNull and the
+        reordering needed by unionAll branches whose columns are in a
+        different order than the first branch.
+        """
+        if "select" in expr:
+            names = ()
+            for selection in expr["select"]:
+                names += self.compile_schema(selection)
+        elif "unionAll" in expr:
+            branches = [
+                self.compile_schema(selection) for selection in expr["unionAll"]
+            ]
+            names = branches[0] if branches else ()
+            for selection, branch in zip(expr["unionAll"], branches):
+                if branch != names:
+                    self.union_orders[id(selection)] = tuple(
+                        branch.index(name) if name in branch else None for name in names
+                    )
+        elif "column" in expr:
+            names = tuple(column["name"] for column in expr["column"])
+        else:
+            names = ()
+        self.null_rows[id(expr)] = (None,) * len(names)
+        return names
 
     def union_all(self, expr, resource):
-        result = []
         for expression in expr["unionAll"]:
-            result += self.call_fn(expression, resource)
-        return result
+            order = self.union_orders.get(id(expression))
+            if order is None:
+                yield from self.call_fn(expression, resource)
+                continue
+            for row in self.call_fn(expression, resource):
+                yield tuple(None if i is None else row[i] for i in order)
 
     def for_each(self, expr, resource):
-        result = []
         selections = self.eval_fhirpath(resource, expr["forEach"])
         for selection in selections:
-            result += self.select(expr, selection)
-        return result
-
-    def get_all_child_columns(self, expression):
-        empty_record = {}
-        if "column" in expression:
-            for column in expression["column"]:
-                empty_record[column["name"]] = None
-        if "select" in expression:
-            for selection in expression["select"]:
-                empty_record |= self.get_all_child_columns(selection)
-        if "unionAll" in expression:
-            for selection in expression["unionAll"]:
-                empty_record |= self.get_all_child_columns(selection)
-        return empty_record
+            yield from self.select(expr, selection)
 
     def for_each_or_null(self, expr, resource):
-        result = []
         selections = self.eval_fhirpath(resource, expr["forEachOrNull"])
         if len(selections) == 0:
-            return [self.get_all_child_columns(expr)]
+            yield self.null_rows[id(expr)]
+            return
         for selection in selections:
-            result += self.select(expr, selection)
-        return result
+            yield from self.select(expr, selection)
+
+    def matches(self, resource, where):
+        for condition in where:
+            val = self.eval_fhirpath(resource, condition["path"])
+            if len(val) == 0 or not val[0]:
+                return False
+            elif not isinstance(val[0], bool):
+                raise Exception("Where clause did not evaluate to boolean")
+        return True
 
     def select(self, expr, resource):
-        if "where" in expr:
-            for condition in expr["where"]:
-                val = self.eval_fhirpath(resource, condition["path"])
-                if len(val) == 0 or not val[0]:
-                    return []
-                elif not isinstance(val[0], bool):
-                    raise Exception("Where clause did not evaluate to boolean")
+        if "where" in expr and not self.matches(resource, expr["where"]):
+            return
+        # Every part but the last is iterated once per row of the parts after
+        # it, so only those are materialized. Any empty part means no rows.
+        selections, last_rows = self.split_select(expr, resource)
         sub_selections = []
-        for selection in expr["select"]:
-            selection_evaluation = self.call_fn(selection, resource)
+        for selection in selections:
+            selection_evaluation = list(self.call_fn(selection, resource))
             if selection_evaluation != []:
                 sub_selections.append(selection_evaluation)
             else:
-                return []
-        return self.row_product(sub_selections)
+                return
+        sub_selections.append(last_rows)
+        yield from self.row_product(sub_selections)
+
+    def select_within_budget(self, expr, resource):
+        # select() with the materialized parts counted against the memory
+        # budget, spilling them to disk once it is exceeded
+        if "where" in expr and not self.matches(resource, expr["where"]):
+            return
+        selections, last_rows = self.split_select(expr, resource)
+        buffers = []
+        try:
+            for selection in selections:
+                buffers.append(
+                    self.memory_budget.buffer(self.call_fn(selection, resource))
+                )
+                if not buffers[-1]:
+                    return
+            yield from self.row_product([*buffers, last_rows])
+        finally:
+            for buffer in buffers:
+                buffer.close()
+
+    def split_select(self, expr, resource):
+        # The parts of a select but the last, and the lazily evaluated rows of
+        # the last part. An empty select has a single empty row.
+        if not expr["select"]:
+            return (), iter([()])
+        *selections, last = expr["select"]
+        return selections, self.call_fn(last, resource)
 
     def column(self, expr, resource):
-        record = {}
+        record = []
         for column in expr["column"]:
             value = self.eval_fhirpath(resource, column["path"])
             if "collection" in column and column["collection"]:
-                record[column["name"]] = value
+                record.append(value)
             elif len(value) == 1:
-                record[column["name"]] = value[0]
+                record.append(value[0])
+            elif len(value) == 0:
+                record.append(None)
+            else:
+                raise Exception("Unexpected multiple values")
+        yield tuple(record)
+
+    def column_vector(self, column, resources, memos=None):
+        # column() for a single column across many resources, with memos
+        # holding the prefixes shared by the columns for each resource
+        fn = self.fhirpath_cache[column["path"]]
+        if memos is not None and hasattr(fn, "with_memo"):
+            results = [
+                fn.with_memo(resource, memo, self.variables)
+                if isinstance(resource, dict)
+                else fn(resource, self.variables)
+                for resource, memo in zip(resources, memos)
+            ]
+        else:
+            results = evaluate_batch(fn, resources, self.variables)
+        if "collection" in column and column["collection"]:
+            return results
+        vector = []
+        for value in results:
+            if len(value) == 1:
+                vector.append(value[0])
             elif len(value) == 0:
-                record[column["name"]] = None
+                vector.append(None)
             else:
                 raise Exception("Unexpected multiple values")
-        return [record]
+        return vector
 
     def call_fn(self, expr, resource):
         if "forEachOrNull" in expr:
@@ -151,16 +680,17 @@ class ViewDefinitionEvaluator:
     # Utility functions
     @staticmethod
     def row_product(parts):
-        if len(parts) == 1:
-            return parts[0]
-        rows = [{}]
-        for part in parts:
-            new_rows = []
-            for partial_row in part:
-                for row in rows:
-                    new_rows.append(partial_row | row)
-            rows = new_rows
-        return rows
+        # Lazy cartesian product with the last part varying slowest. The last
+        # part is only iterated once, so it may be a generator.
+        *head, last = parts
+        if not head:
+            yield from last
+            return
+        first, *middle = head
+        for row in last:
+            for suffix in row_suffixes(middle, row):
+                for partial_row in first:
+                    yield partial_row + suffix
 
     # FHIRPath Helper Functions
     @staticmethod
@@ -179,8 +709,132 @@ class ViewDefinitionEvaluator:
         return resource
 
 
+def shared_fhirpath(fn, cuts, memos):
+    """Wrap a fast path expression to share the prefixes in ``cuts``.
+
+    The memo used is that of ``memos.focus``, the thread's current focus,
+    which moves to each resource or item the expression is evaluated on.
+    ``with_memo()`` takes the memo to use instead.
+    """
+    with_memo = fn.share(cuts)
+
+    def shared(resource, context=None):
+        if not isinstance(resource, dict):
+            return fn(resource, context)
+        if getattr(memos, "focus", None) is not resource:
+            memos.focus = resource
+            memos.memo = {}
+        return with_memo(resource, memos.memo, context)
+
+    shared.with_memo = with_memo
+    shared.parsedPath = fn.parsedPath
+    shared.steps = fn.steps
+    return shared
+
+
+def focus_scopes(expr, scope, scopes):
+    """Group the FHIRPath expressions of a plan by the focus they run on.
+
+    ``scope`` collects the paths evaluated on the current focus and a new
+    scope is appended to ``scopes`` for the items of each forEach.
+    """
+    for key in ("forEach", "forEachOrNull"):
+        if key in expr:
+            scope.append(expr[key])
+            scope = []
+            scopes.append(scope)
+    for clause in (*expr.get("where", ()), *expr.get("column", ())):
+        scope.append(clause["path"])
+    for selection in (*expr.get("select", ()), *expr.get("unionAll", ())):
+        focus_scopes(selection, scope, scopes)
+
+
+def row_suffixes(parts, row):
+    # Rows of the product of parts, each followed by row
+    if not parts:
+        yield row
+        return
+    *rest, part = parts
+    for partial_row in part:
+        yield from row_suffixes(rest, partial_row + row)
+
+
+USER_INVOCATION_TABLE = {
+    "getReferenceKey": {
+        "fn": ViewDefinitionEvaluator.get_reference_key,
+        "arity": {0: [], 1: ["Identifier"]},
+    },
+    "getResourceKey": {"fn": ViewDefinitionEvaluator.get_resource_key},
+    "identity": {"fn": ViewDefinitionEvaluator.identity},
+}
+
+
 # View Definition Normalization & Validation
-def normalize(view, constants):
+def plan_view(view_definition):
+    """Normalize a view definition into an immutable evaluation plan.
+
+    The view definition is not modified. Mappings in the plan are read-only
+    proxies and lists are tuples, so a plan can be shared between compiled
+    views and threads.
+
+    Returns:
+        ``(plan, where)``, where ``where`` holds the view's root ``where``
+        clauses. They are kept out of the plan so that a resource can be
+        rejected before any column is evaluated.
+    """
+    view = dict(view_definition)
+    where = []
+    # A root forEach would evaluate where once per item, so it stays in place
+    if "forEach" not in view and "forEachOrNull" not in view:
+        where = [
+            where_clause | {"path": replace_this(where_clause["path"])}
+            for where_clause in view.pop("where", [])
+        ]
+    return freeze(normalize(view)), freeze(where)
+
+
+def vector_columns(plan):
+    """Return the columns of a plan that can be evaluated a column at a time.
+
+    That is the case when every node yields exactly one row per resource:
+    a column node, or a select of column nodes. Returns None otherwise.
+    """
+    nested = ("select", "unionAll", "forEach", "forEachOrNull")
+    if "column" in plan and not any(key in plan for key in nested):
+        return plan["column"]
+    if any(key in plan for key in ("unionAll", "forEach", "forEachOrNull", "where")):
+        return None
+    columns = ()
+    for selection in plan.get("select", ()):
+        if "column" not in selection or any(key in selection for key in nested):
+            return None
+        columns += selection["column"]
+    return columns or None
+
+
+def view_key(view_definition):
+    """Return a hash of the canonical JSON form of a view definition."""
+    canonical = json.dumps(
+        view_definition, sort_keys=True, separators=(",", ":"), default=_key_value
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _key_value(value):
+    # Values JSON has no type for, such as the Decimal constants produced by
+    # json.load(..., parse_float=Decimal), keyed by type name and text
+    return {"type": type(value).__name__, "value": str(value)}
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def normalize(view):
     # Make sure we only operate on keys we have implemented for
     current_functions = view.keys() & {
         "select",
@@ -190,79 +844,81 @@ def normalize(view, constants):
         "forEachOrNull",
     }
     if "forEach" in view or "forEachOrNull" in view:
-        if "forEach" in view:
-            view["forEach"] = replace_constants(view["forEach"], constants)
-        if "select" not in view:
-            view["select"] = []
         # Move column & unionAll under forEach for evaluation for_each() -> union_all()/column()
         view = move_functions(
             view, "select", current_functions - {"forEach", "select", "forEachOrNull"}
         )
-        view["select"] = [
-            normalize(selection, constants) for selection in view["select"]
-        ]
+        if "forEach" in view:
+            view["forEach"] = replace_this(view["forEach"])
+        view["select"] = [normalize(selection) for selection in view["select"]]
     elif "select" in view:
         view = move_functions(view, "select", current_functions - {"select"})
-        view["select"] = [
-            normalize(selection, constants) for selection in view["select"]
-        ]
+        view["select"] = [normalize(selection) for selection in view["select"]]
         if "where" in view:
-            for where_clause in view["where"]:
-                where_clause["path"] = replace_constants(
-                    where_clause["path"], constants
-                )
+            view["where"] = [
+                where_clause | {"path": replace_this(where_clause["path"])}
+                for where_clause in view["where"]
+            ]
     # if unionAll and column are present make sure it is evaluated as row_product(unionAll + column)
     # instead of union_all(column()). We also require select() to make sure both get evaluated
     # and union_all doesn't take precedence
     elif "unionAll" in view and "column" in view:
-        view["select"] = []
         view = move_functions(view, "select", current_functions - {"select"})
-        view["select"] = [
-            normalize(selection, constants) for selection in view["select"]
-        ]
+        view["select"] = [normalize(selection) for selection in view["select"]]
     elif "unionAll" in view:
         view = move_functions(view, "unionAll", current_functions - {"unionAll"})
-        view["unionAll"] = [
-            normalize(selection, constants) for selection in view["unionAll"]
-        ]
+        view["unionAll"] = [normalize(selection) for selection in view["unionAll"]]
         validate_union_all(view["unionAll"])
     elif "column" in view:
-        for column in view["column"]:
-            column["path"] = replace_constants(column["path"], constants)
+        view = dict(view)
+        view["column"] = [
+            column | {"path": replace_this(column["path"])} for column in view["column"]
+        ]
     return view
 
 
-def replace_constants(path, constants):
+def get_column_definitions(expression):
+    """Return the column definitions of a normalized view in output order."""
+    definitions = list(expression.get("column", []))
+    for key in ("select", "unionAll"):
+        for selection in expression.get(key, []):
+            definitions += get_column_definitions(selection)
+    unique = {}
+    for column in definitions:
+        unique.setdefault(column["name"], column)
+    return list(unique.values())
+
+
+def constant_variables(constants):
+    """Return the values of a view's constants, keyed by name.
+
+    Constants are bound as FHIRPath environment variables when expressions
+    are evaluated, so ``%name`` is never substituted into the path text and
+    compiled expressions are shared between views with different constants.
+    """
+    variables = {}
     for constant in constants:
-        value_key = [vk for vk in constant.keys() if vk.startswith("value")]
-        if "valueBoolean" in constant:
-            path = path.replace(
-                "%" + constant["name"], str(constant["valueBoolean"]).lower()
-            )
-        elif value_key[0] in [
-            "valueInteger",
-            "valueDecimal",
-            "valueUnsignedInt",
-            "valuePositiveInt",
-        ]:
-            path = path.replace("%" + constant["name"], str(constant[value_key[0]]))
-        elif len(value_key) == 1:
-            path = path.replace(
-                "%" + constant["name"], "'" + constant[value_key[0]] + "'"
-            )
+        value_keys = [key for key in constant if key.startswith("value")]
+        if len(value_keys) != 1:
+            raise Exception(f"Constant {constant.get('name')} must have one value")
+        value = constant[value_keys[0]]
+        if value_keys[0] == "valueDecimal":
+            value = Decimal(str(value))
+        variables[constant["name"]] = value
+    return variables
+
+
+def replace_this(path):
     # $this is not in the FHIRPath spec, replacing as per reference implementation
-    replaced_path = path.replace("$this", "identity()")
-    return replaced_path
+    return path.replace("$this", "identity()")
 
 
 def move_functions(view, function, sub_functions):
-    if "column" in sub_functions:
-        view[function].insert(0, {"column": view["column"]})
-        del view["column"]
-    if "unionAll" in sub_functions:
-        view[function].insert(0, {"unionAll": view["unionAll"]})
-        del view["unionAll"]
-    return view
+    # Returns a copy of view with the sub functions prepended to view[function]
+    moved = [{key: view[key]} for key in ("unionAll", "column") if key in sub_functions]
+    result = {key: value for key, value in view.items() if key not in sub_functions}
+    result[function] = moved + list(view.get(function, []))
+    return result
 
 
 def validate_union_all(union_all):
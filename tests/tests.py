@@ -1,9 +1,52 @@
 # Copyright © 2025, SAS Institute Inc., Cary, NC, USA. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import asyncio
+import http.client
+import socket
+import subprocess
+import sys
+import threading
 import pytest
 import json
-from sqlonfhir import evaluate
+import copy
+import os
+from array import array
+from decimal import Decimal
+from fhirpathpy import compile
+from fhirpathpy.models import models
+from sqlonfhir import (
+    aiter_evaluate,
+    CsvSink,
+    IncrementalEvaluator,
+    MemoryBudget,
+    NdjsonSink,
+    ParallelEvaluator,
+    ParquetSink,
+    PartitionedSink,
+    PlanCache,
+    Profiler,
+    compile_view,
+    evaluate,
+    evaluate_many,
+    evaluate_to,
+    hash_bucket,
+    iter_evaluate,
+    join,
+    read_ndjson,
+    run_bulk,
+    value_prefix,
+)
+from sqlonfhir.fastpath import compile_fast_path
+from sqlonfhir.service import EvaluationService
+from sqlonfhir.sqlonfhir import (
+    USER_INVOCATION_TABLE,
+    CompiledView,
+    ViewDefinitionEvaluator,
+    compile_fhirpath,
+    replace_this,
+    view_key,
+)
 
 
 def load_test_file(filename):
@@ -12,6 +55,33 @@ def load_test_file(filename):
         return json.load(f)
 
 
+def spec_cases(*filenames):
+    """Run a test once per passing test case of the files, see spec_case"""
+    return pytest.mark.parametrize(
+        "spec_case",
+        [
+            (filename, t)
+            for filename in filenames
+            for t in load_test_file(filename)["tests"]
+            if not t.get("expectError")
+        ],
+        ids=spec_case_id,
+        indirect=True,
+    )
+
+
+def spec_case_id(case):
+    filename, test_case = case
+    return f"{filename}.json::{test_case['title']}"
+
+
+@pytest.fixture
+def spec_case(request):
+    """The resources of a test file and one of its test cases"""
+    filename, test_case = request.param
+    return load_test_file(filename)["resources"], test_case
+
+
 @pytest.mark.parametrize(
     "test_case",
     load_test_file("basic")["tests"],
@@ -327,3 +397,919 @@ def test_fn_boundary_cases(test_case):
     else:
         result = evaluate(resources, test_case["view"])
         assert result == test_case["expect"]
+
+
+def test_iter_evaluate_streams_from_generator():
+    """iter_evaluate accepts a one-shot iterator and yields rows lazily"""
+    resources = load_test_file("basic")["resources"]
+    view = load_test_file("basic")["tests"][0]["view"]
+    rows = iter_evaluate((resource for resource in resources), view)
+    assert not isinstance(rows, list)
+    assert list(rows) == evaluate(resources, view)
+
+
+def test_read_ndjson(tmp_path):
+    """read_ndjson lazily parses one resource per non-blank line"""
+    resources = load_test_file("basic")["resources"]
+    view = load_test_file("basic")["tests"][0]["view"]
+    path = tmp_path / "export.ndjson"
+    path.write_text("\n".join(json.dumps(r) for r in resources) + "\n\n")
+    assert list(read_ndjson(str(path))) == resources
+    with open(path) as f:
+        assert list(iter_evaluate(read_ndjson(f), view)) == evaluate(resources, view)
+
+
+def test_read_ndjson_skips_other_resource_types(tmp_path):
+    """Lines of other types are skipped, including ones the raw peek cannot decide"""
+    patient = {"resourceType": "Patient", "id": "p1"}
+    bundle = {"resourceType": "Bundle", "entry": [{"resource": patient}]}
+    contained = {
+        "resourceType": "Patient",
+        "id": "p2",
+        "contained": [{"resourceType": "Observation"}],
+    }
+    lines = [
+        json.dumps(patient),
+        json.dumps(bundle),
+        json.dumps(contained, indent=None, separators=(",", " : ")),
+    ]
+    (tmp_path / "mixed.ndjson").write_text("\n".join(lines))
+    (tmp_path / "Observation.000.ndjson").write_text("not json")
+    expected = [patient, contained]
+    assert list(read_ndjson(str(tmp_path / "mixed.ndjson"), "Patient")) == expected
+    assert list(read_ndjson(str(tmp_path), {"Patient"}, memory_map=True)) == expected
+    with open(tmp_path / "mixed.ndjson") as f:
+        assert list(read_ndjson(f, ["Bundle"])) == [bundle]
+
+
+def test_read_ndjson_orjson(tmp_path):
+    pytest.importorskip("orjson")
+    resources = load_test_file("basic")["resources"]
+    path = tmp_path / "export.ndjson"
+    path.write_text("\n".join(json.dumps(r) for r in resources))
+    assert list(read_ndjson(str(path), parser="orjson")) == resources
+
+
+def test_root_where_is_checked_first_and_gives_required_literals(tmp_path):
+    """Root where clauses filter resources before columns and prefilter raw lines"""
+    resources = [
+        {"resourceType": "Observation", "id": "o1", "status": "final"},
+        {"resourceType": "Observation", "id": "o2", "status": "amended"},
+        {"resourceType": "Observation", "id": "o3"},
+    ]
+    view = compile_view(
+        {
+            "resource": "Observation",
+            "column": [{"name": "id", "path": "id"}],
+            "where": [{"path": "status = %status"}],
+            "constant": [{"name": "status", "valueString": "final"}],
+        }
+    )
+    assert view.evaluate(resources) == [{"id": "o1"}]
+    assert view.required_literals == ("final",)
+    path = tmp_path / "Observation.ndjson"
+    path.write_text("\n".join(json.dumps(r) for r in resources))
+    lines = read_ndjson(str(path), must_contain=view.required_literals)
+    assert [r["id"] for r in lines] == ["o1"]
+
+
+def test_compile_view_is_reusable_and_shares_fhirpath_cache():
+    """A compiled view evaluates repeatedly and shares compiled expressions"""
+    resources = load_test_file("basic")["resources"]
+    view = load_test_file("basic")["tests"][0]["view"]
+    compiled = compile_view(view)
+    misses = compile_fhirpath.cache_info().misses
+    assert compiled.evaluate(resources) == evaluate(resources, view)
+    assert list(compiled.iter_rows(iter(resources))) == compiled.evaluate(resources)
+    compile_view(view)
+    assert compile_fhirpath.cache_info().misses == misses
+    with pytest.raises(AttributeError):
+        compiled.resource = "Observation"
+
+
+def test_compile_view_does_not_modify_view_and_is_cached():
+    """Normalization leaves the view definition untouched and is done once"""
+    view = load_test_file("union")["tests"][0]["view"]
+    before = json.dumps(view, sort_keys=True)
+    compiled = compile_view(view)
+    assert json.dumps(view, sort_keys=True) == before
+    assert compile_view(copy.deepcopy(view)) is compiled
+    with pytest.raises(TypeError):
+        compiled._plan["resource"] = "Observation"
+
+
+@spec_cases("union")
+def test_iter_tuples_follow_column_names(spec_case):
+    """Tuple rows hold the same values as row dictionaries"""
+    resources, test_case = spec_case
+    view = compile_view(test_case["view"])
+    rows = [dict(zip(view.column_names, row)) for row in view.iter_tuples(resources)]
+    assert rows == test_case["expect"]
+
+
+@spec_cases("basic", "collection", "where", "foreach")
+def test_iter_batches_match_rows(spec_case):
+    """Column vectors hold the same rows as iter_rows() for any batch size"""
+    resources, test_case = spec_case
+    view = compile_view(test_case["view"])
+    for batch_size in (1, 2, 10000):
+        rows = [
+            dict(zip(batch, values))
+            for batch in view.iter_batches(resources, batch_size)
+            for values in zip(*batch.values())
+        ]
+        assert rows == test_case["expect"]
+
+
+def test_row_product_is_lazy_and_ordered():
+    """The last part varies slowest and is consumed as rows are produced"""
+    consumed = []
+
+    def last():
+        for row in [(5,), (6,)]:
+            consumed.append(row)
+            yield row
+
+    rows = ViewDefinitionEvaluator.row_product([[(1,), (2,)], [(3,), (4,)], last()])
+    assert next(rows) == (1, 3, 5)
+    assert consumed == [(5,)]
+    assert list(rows) == [
+        (2, 3, 5),
+        (1, 4, 5),
+        (2, 4, 5),
+        (1, 3, 6),
+        (2, 3, 6),
+        (1, 4, 6),
+        (2, 4, 6),
+    ]
+
+
+def test_constants_are_bound_as_variables():
+    """Constants are passed to FHIRPath as variables and share compiled paths"""
+    resources = [
+        {
+            "resourceType": "Observation",
+            "id": "o1",
+            "code": {"coding": [{"system": "s", "code": "c"}]},
+        },
+        {
+            "resourceType": "Observation",
+            "id": "o2",
+            "code": {"coding": [{"system": "s", "code": "d"}]},
+        },
+    ]
+
+    def view(code):
+        return {
+            "resource": "Observation",
+            "constant": [
+                {"name": "codeSystem", "valueUri": "s"},
+                {"name": "code", "valueCode": code},
+            ],
+            "select": [{"column": [{"name": "id", "path": "id"}]}],
+            "where": [
+                {"path": "code.coding.where(system = %codeSystem).exists()"},
+                {"path": "code.coding.where(code = %code).exists()"},
+            ],
+        }
+
+    assert evaluate(resources, view("c")) == [{"id": "o1"}]
+    misses = compile_fhirpath.cache_info().misses
+    assert evaluate(resources, view("d")) == [{"id": "o2"}]
+    assert compile_fhirpath.cache_info().misses == misses
+
+
+def test_evaluate_many_matches_individual_views():
+    """evaluate_many yields the same rows per view as separate evaluate calls"""
+    resources = load_test_file("view_resource")["resources"]
+    views = {
+        t["title"]: t["view"]
+        for t in load_test_file("view_resource")["tests"]
+        if not t.get("expectError")
+    }
+    views["compiled"] = compile_view(load_test_file("basic")["tests"][0]["view"])
+    tables = {name: [] for name in views}
+    for name, row in evaluate_many(iter(resources), views):
+        tables[name].append(row)
+    for name, view in views.items():
+        if name == "compiled":
+            assert tables[name] == view.evaluate(resources)
+        else:
+            assert tables[name] == evaluate(resources, view)
+
+
+def test_profiler_reports_nodes_and_expressions():
+    """A profiled view returns the same rows and counts rows per node"""
+    resources = load_test_file("foreach")["resources"]
+    view = load_test_file("foreach")["tests"][0]["view"]
+    spans = []
+    profiler = Profiler(on_span=lambda *span: spans.append(span))
+    rows = compile_view(view, profiler=profiler).evaluate(
+        resources + [{"resourceType": "Observation", "id": "o1"}]
+    )
+    assert rows == evaluate(resources, view)
+    report = profiler.report()
+    assert report["resources"] == {
+        "evaluated": len(resources),
+        "skipped": 1,
+        "filtered": 0,
+    }
+    assert report["nodes"][0]["rows_out"] == len(rows)
+    assert len(spans) == sum(node["rows_in"] for node in report["nodes"])
+    assert all(expression["calls"] for expression in report["expressions"])
+
+    # Cache hits and misses are those of compile_fhirpath() at compile time
+    path = "name.family.where($this != 'profiler-cache')"
+    cache_view = {"resource": "Patient", "column": [{"name": "f", "path": path}]}
+    for hits, misses in ((0, 1), (1, 0)):
+        profiler = Profiler()
+        compile_view(cache_view, profiler=profiler)
+        (expression,) = profiler.report()["expressions"]
+        assert (expression["cache_hits"], expression["cache_misses"]) == (hits, misses)
+
+
+def test_incremental_changes_match_full_rebuild():
+    """Applying changesets gives the same table as evaluating everything again"""
+    view = load_test_file("foreach")["tests"][0]["view"]
+    resources = copy.deepcopy(load_test_file("foreach")["resources"])
+
+    def rebuild(resources):
+        table = {}
+        for resource in resources:
+            rows = evaluate([resource], view)
+            if rows:
+                table[resource["id"]] = rows
+        return table
+
+    evaluator = IncrementalEvaluator(view)
+    table = evaluator.changes(resources, complete=True).apply({})
+    assert table == rebuild(resources)
+
+    changed = copy.deepcopy(resources)
+    changed[0]["name"] = [{"family": "Changed"}]
+    changed[0]["meta"] = {"versionId": "2"}
+    removed = changed.pop()
+    evaluator = IncrementalEvaluator(view, versions=evaluator.versions)
+    changes = evaluator.changes(changed, complete=True)
+    assert changes.unchanged == len(changed) - 1
+    assert list(changes.upserts) == [changed[0]["id"]]
+    assert removed["id"] in changes.deletes
+    assert changes.apply(table) == rebuild(changed)
+
+    # Decimal values, as parsed with parse_float=Decimal, hash like floats
+    line = '{"resourceType": "Observation", "id": "o", "valueQuantity": {"value": 1.5}}'
+    observation = json.loads(line, parse_float=Decimal)
+    number_view = {
+        "resource": "Observation",
+        "column": [{"name": "value", "path": "value.ofType(Quantity).value"}],
+    }
+    evaluator = IncrementalEvaluator(number_view)
+    assert len(evaluator.changes([observation])) == 1
+    assert len(evaluator.changes([json.loads(line)])) == 0
+    observation["valueQuantity"]["value"] = Decimal("2.5")
+    assert len(evaluator.changes([observation])) == 1
+    # Changing the view re-evaluates every resource
+    number_view["column"].append({"name": "id", "path": "id"})
+    evaluator = IncrementalEvaluator(number_view, versions=evaluator.versions)
+    assert len(evaluator.changes([observation])) == 1
+
+
+def test_aiter_evaluate_matches_serial_order():
+    """Async evaluation of an async source yields the same rows in order"""
+    resources = load_test_file("foreach")["resources"] * 5
+    view = load_test_file("foreach")["tests"][0]["view"]
+
+    async def pages():
+        for resource in resources:
+            await asyncio.sleep(0)
+            yield resource
+
+    async def collect(limit=None):
+        rows = []
+        async for row in aiter_evaluate(pages(), view, batch_size=2):
+            rows.append(row)
+            if len(rows) == limit:
+                break
+        return rows
+
+    expected = evaluate(resources, view)
+    assert asyncio.run(collect()) == expected
+    assert asyncio.run(collect(limit=3)) == expected[:3]
+
+    # Plain iterables are read outside the event loop's thread
+    threads = set()
+
+    def blocking_source():
+        for resource in resources:
+            threads.add(threading.get_ident())
+            yield resource
+
+    async def collect_blocking():
+        return [row async for row in aiter_evaluate(blocking_source(), view, 2)]
+
+    assert asyncio.run(collect_blocking()) == expected
+    assert threads and threading.get_ident() not in threads
+
+
+@pytest.mark.parametrize("max_build_rows", [1000, 3, 1])
+def test_join_on_reference_keys(tmp_path, monkeypatch, max_build_rows):
+    """Rows are joined on reference keys, in memory or through spill files"""
+    patients = [{"id": "p1", "name": "A"}, {"id": "p2", "name": "B"}, {"id": None}]
+    if max_build_rows >= len(patients):
+
+        def spill(*args):
+            raise AssertionError("A right side of max_build_rows rows was spilled")
+
+        # sqlonfhir.join is also the name of the function, hence sys.modules
+        monkeypatch.setattr(sys.modules["sqlonfhir.join"], "_grace_join", spill)
+    observations = [
+        {"id": "o1", "patient": "p1"},
+        {"id": "o2", "patient": "p3"},
+        {"id": "o3", "patient": "p1"},
+        {"id": "o4", "patient": None},
+    ]
+    options = {"max_build_rows": max_build_rows, "spill_dir": str(tmp_path)}
+    rows = join(observations, patients, on=("patient", "id"), **options)
+    assert sorted(rows, key=lambda row: row["id"]) == [
+        {"id": "o1", "patient": "p1", "id_right": "p1", "name": "A"},
+        {"id": "o3", "patient": "p1", "id_right": "p1", "name": "A"},
+    ]
+    rows = join(observations, patients, on=("patient", "id"), how="left", **options)
+    assert sorted(row["id"] for row in rows if row["name"] is None) == ["o2", "o4"]
+    assert list(tmp_path.iterdir()) == []
+
+
+@spec_cases("combinations", "foreach", "union")
+@pytest.mark.parametrize("limit", [0, 10**9])
+def test_memory_budget_spills_without_changing_rows(tmp_path, spec_case, limit):
+    """Rows are the same whether buffered parts stay in memory or spill"""
+    resources, test_case = spec_case
+    budget = MemoryBudget(limit, spill_dir=str(tmp_path))
+    rows = evaluate(resources, test_case["view"], memory_budget=budget)
+    assert rows == test_case["expect"]
+    assert budget.used == 0
+    assert list(tmp_path.iterdir()) == []
+    if limit:
+        assert budget.report()["spilled_rows"] == 0
+
+
+@spec_cases("constant", "foreach", "where")
+def test_plan_cache_round_trip(tmp_path, monkeypatch, spec_case):
+    """Views loaded from a plan cache are evaluated without parsing paths"""
+    resources, test_case = spec_case
+    cache = PlanCache(str(tmp_path))
+    stored = CompiledView(test_case["view"], plan_cache=cache)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    def parse(path):
+        raise AssertionError(f"{path} was parsed")
+
+    monkeypatch.setattr("fhirpathpy.parser.parse", parse)
+    loaded = CompiledView(test_case["view"], plan_cache=cache)
+    assert loaded.evaluate(resources) == test_case["expect"]
+    assert loaded.column_names == stored.column_names
+    assert loaded.required_literals == stored.required_literals
+
+
+def test_plan_cache_stores_views_compiled_without_it(tmp_path):
+    """Views already compiled in the process are still written to a plan cache"""
+    view = {
+        "resource": "Patient",
+        "column": [{"name": "id", "path": "id"}, {"name": "stored", "path": "true"}],
+    }
+    compiled = compile_view(view)
+    cache = PlanCache(str(tmp_path / "plans"))
+    assert view_key(view) not in cache
+    assert compile_view(view, plan_cache=cache) is compiled
+    assert view_key(view) in cache
+    loaded = CompiledView(view, plan_cache=cache)
+    assert loaded.evaluate(SINK_RESOURCES) == compiled.evaluate(SINK_RESOURCES)
+
+
+def test_decimal_constants_are_cached(tmp_path):
+    """Views with Decimal constants are keyed and compiled with a plan cache"""
+    view = {
+        "resource": "Patient",
+        "constant": [{"name": "x", "valueDecimal": Decimal("1.5")}],
+        "select": [{"column": [{"name": "x", "path": "%x"}]}],
+    }
+    resources = [{"resourceType": "Patient", "id": "a"}]
+    assert view_key(view) == view_key(copy.deepcopy(view))
+    assert view_key(view) != view_key(
+        {**view, "constant": [{"name": "x", "valueDecimal": "1.5"}]}
+    )
+    assert compile_view(view).evaluate(resources) == [{"x": Decimal("1.5")}]
+    cached = compile_view(view, plan_cache=PlanCache(str(tmp_path)))
+    assert cached.evaluate(resources) == [{"x": Decimal("1.5")}]
+    assert [path.name for path in tmp_path.iterdir()] == []
+
+
+def test_plan_cache_skips_fhirpathpy_import(tmp_path):
+    """Fast path views loaded from a plan cache never import the parser"""
+    view = load_test_file("foreach")["tests"][0]["view"]
+    script = (
+        "import json, sys\n"
+        "from sqlonfhir import PlanCache, compile_view\n"
+        f"view = json.loads({json.dumps(json.dumps(view))})\n"
+        f"compile_view(view, plan_cache=PlanCache({str(tmp_path)!r}))\n"
+        "print(sorted(m for m in ('antlr4', 'fhirpathpy') if m in sys.modules))\n"
+    )
+    runs = [
+        subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        ).stdout
+        for _ in range(2)
+    ]
+    assert runs == ["['antlr4', 'fhirpathpy']\n", "[]\n"]
+
+
+def test_empty_select_yields_empty_row(tmp_path):
+    """An empty select is the product of no parts, a single empty row"""
+    resources = [{"resourceType": "Patient", "id": "a"}]
+    view = {
+        "resource": "Patient",
+        "select": [{"column": [{"name": "id", "path": "id"}]}, {"select": []}],
+    }
+    empty = {"resource": "Patient", "select": []}
+    assert evaluate(resources, empty) == [{}]
+    assert evaluate(resources, view) == [{"id": "a"}]
+    budget = MemoryBudget(0, spill_dir=str(tmp_path))
+    assert evaluate(resources, empty, memory_budget=budget) == [{}]
+    assert evaluate(resources, view, memory_budget=budget) == [{"id": "a"}]
+
+
+def test_parallel_evaluation_matches_serial_order():
+    """Parallel evaluation returns the same rows in the same order as serial"""
+    resources = load_test_file("foreach")["resources"] * 5
+    view = load_test_file("foreach")["tests"][0]["view"]
+    evaluator = ParallelEvaluator(view, workers=2, chunk_size=2)
+    assert evaluator.evaluate(iter(resources)) == evaluate(resources, view)
+    assert evaluate(resources, view, workers=2) == evaluate(resources, view)
+
+
+@spec_cases("foreach", "fhirpath_numbers")
+def test_columnar_output_matches_rows(spec_case):
+    """Columnar output holds the same values as row output"""
+    resources, test_case = spec_case
+    result = evaluate(resources, test_case["view"], output="columnar")
+    assert len(result) == len(test_case["expect"])
+    # Compared by repr too, as Decimal("1.5") == 1.5
+    rows = evaluate(resources, test_case["view"])
+    assert result.to_rows() == rows
+    assert repr(result.to_rows()) == repr(rows)
+
+
+def test_columnar_typed_columns():
+    """Numeric columns are stored in typed buffers with nulls tracked"""
+    resources = [
+        {"resourceType": "Patient", "id": "a", "multipleBirthInteger": 2},
+        {"resourceType": "Patient", "id": "b"},
+    ]
+    view = {
+        "resource": "Patient",
+        "column": [
+            {"name": "id", "path": "id"},
+            {"name": "births", "path": "multipleBirthInteger", "type": "integer"},
+        ],
+    }
+    result = evaluate(resources, view, output="columnar")
+    assert result.column_names == ["id", "births"]
+    assert result["births"] == [2, None]
+    buffer = result.column_buffer("births")
+    assert (buffer.typecode, buffer.values, buffer.null_count) == (
+        "q",
+        array("q", [2, 0]),
+        1,
+    )
+    assert buffer.validity == bytearray([1])
+    assert result.to_pydict() == {"id": ["a", "b"], "births": [2, None]}
+
+    pa = pytest.importorskip("pyarrow")
+    table = result.to_arrow()
+    assert table.schema.field("births").type == pa.int64()
+    assert table.to_pylist() == [{"id": "a", "births": 2}, {"id": "b", "births": None}]
+
+
+SINK_VIEW = {
+    "resource": "Patient",
+    "column": [
+        {"name": "id", "path": "id", "type": "id"},
+        {"name": "active", "path": "active", "type": "boolean"},
+        {"name": "given", "path": "name.given", "collection": True},
+    ],
+}
+SINK_RESOURCES = [
+    {"resourceType": "Patient", "id": "a", "active": True, "name": [{"given": ["x"]}]},
+    {"resourceType": "Patient", "id": "b"},
+    {"resourceType": "Patient", "id": "c", "active": False},
+]
+
+
+def test_evaluate_to_ndjson_and_csv_sinks(tmp_path):
+    """Rows are written to NDJSON and CSV sinks in batches"""
+    ndjson_path = tmp_path / "out.ndjson"
+    assert evaluate_to(SINK_RESOURCES, SINK_VIEW, NdjsonSink(ndjson_path), 2) == 3
+    assert list(read_ndjson(str(ndjson_path))) == evaluate(SINK_RESOURCES, SINK_VIEW)
+
+    csv_path = tmp_path / "out.csv"
+    evaluate_to(SINK_RESOURCES, SINK_VIEW, CsvSink(csv_path), batch_size=2)
+    assert csv_path.read_text().splitlines() == [
+        "id,active,given",
+        'a,true,"[""x""]"',
+        "b,,[]",
+        "c,false,[]",
+    ]
+
+
+def test_evaluate_to_parquet_sink(tmp_path):
+    """Parquet output uses a schema derived from the view's columns"""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "out.parquet"
+    evaluate_to(SINK_RESOURCES, SINK_VIEW, ParquetSink(path, row_group_size=2))
+    parquet = pq.ParquetFile(path)
+    assert parquet.num_row_groups == 2
+    assert parquet.schema_arrow.field("active").type == pa.bool_()
+    assert parquet.schema_arrow.field("given").type == pa.list_(pa.string())
+    assert parquet.read().to_pylist() == evaluate(SINK_RESOURCES, SINK_VIEW)
+
+
+def test_sinks_keep_decimal_precision(tmp_path):
+    """Decimal values are written exactly to NDJSON and Parquet"""
+    lines = [
+        '{"resourceType": "Observation", "id": "a", "valueQuantity": {"value": 0.1}}',
+        '{"resourceType": "Observation", "id": "b",'
+        ' "valueQuantity": {"value": 1.000000000000000001}}',
+    ]
+    resources = [json.loads(line, parse_float=Decimal) for line in lines]
+    view = {
+        "resource": "Observation",
+        "column": [
+            {"name": "id", "path": "id"},
+            {
+                "name": "value",
+                "path": "value.ofType(Quantity).value",
+                "type": "decimal",
+            },
+            {
+                "name": "values",
+                "path": "value.ofType(Quantity).value",
+                "collection": True,
+            },
+        ],
+    }
+    expected = [
+        {"id": "a", "value": Decimal("0.1"), "values": [Decimal("0.1")]},
+        {
+            "id": "b",
+            "value": Decimal("1.000000000000000001"),
+            "values": [Decimal("1.000000000000000001")],
+        },
+    ]
+    ndjson_path = tmp_path / "out.ndjson"
+    evaluate_to(resources, view, NdjsonSink(ndjson_path))
+    rows = [json.loads(line, parse_float=Decimal) for line in open(ndjson_path)]
+    assert repr(rows) == repr(expected)
+
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    parquet_path = tmp_path / "out.parquet"
+    evaluate_to(resources, view, ParquetSink(parquet_path))
+    table = pq.read_table(parquet_path)
+    assert table.schema.field("value").type == pa.decimal128(38, 18)
+    assert table.column("value").to_pylist() == [row["value"] for row in expected]
+    assert table.column("values").to_pylist() == [["0.1"], ["1.000000000000000001"]]
+
+
+@pytest.mark.parametrize("max_open_files", [64, 1])
+def test_partitioned_sink_writes_hive_layout(tmp_path, max_open_files):
+    """Rows land in name=value directories, reopened partitions get new parts"""
+    resources = [
+        {"resourceType": "Patient", "id": f"a/{i}", "active": i % 3 == 0}
+        for i in range(10)
+    ] + [{"resourceType": "Patient", "id": "b"}]
+    view = {
+        "resource": "Patient",
+        "column": [{"name": "id", "path": "id"}, {"name": "active", "path": "active"}],
+    }
+    sink = PartitionedSink(
+        tmp_path,
+        {"is_active": "active", "prefix": value_prefix("id", 2)},
+        max_open_files=max_open_files,
+        buffer_rows=2,
+    )
+    assert evaluate_to(resources, view, sink, batch_size=3) == 11
+    files = sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*.*"))
+    assert {path.rsplit("/", 1)[0] for path in files} == {
+        "is_active=__HIVE_DEFAULT_PARTITION__/prefix=b",
+        "is_active=false/prefix=a%2F",
+        "is_active=true/prefix=a%2F",
+    }
+    rows = [row for path in files for row in read_ndjson(str(tmp_path / path))]
+
+    def by_id(row):
+        return row["id"]
+
+    assert sorted(rows, key=by_id) == sorted(evaluate(resources, view), key=by_id)
+    assert len(files) == sink.files_written
+    assert (len(files) > 3) == (max_open_files == 1)
+
+    bucket = hash_bucket("id", 256)
+    assert bucket({"id": "p1"}) == bucket({"id": "p1"}) < 256
+    assert bucket({"id": None}) is None
+    with pytest.raises(Exception, match="column names"):
+        evaluate_to(resources, view, PartitionedSink(tmp_path, {"id": "id"}))
+
+
+def test_shared_prefixes_match_separate_expressions():
+    """Prefixes shared by columns and where clauses give the same rows"""
+    loinc = "code.coding.where(system = 'http://loinc.org')"
+    view = {
+        "resource": "Observation",
+        "where": [{"path": f"{loinc}.exists()"}],
+        "select": [
+            {
+                "column": [
+                    {"name": "id", "path": "getResourceKey()"},
+                    {"name": "patient", "path": "subject.getReferenceKey(Patient)"},
+                    {"name": "code", "path": f"{loinc}.code"},
+                    {"name": "display", "path": f"{loinc}.display"},
+                ]
+            },
+            {
+                "forEach": "component",
+                "column": [
+                    {"name": "component", "path": f"{loinc}.code"},
+                    {"name": "unit", "path": "valueQuantity.unit"},
+                ],
+            },
+        ],
+    }
+    coding = {"system": "http://loinc.org", "code": "8480-6", "display": "Systolic"}
+    resources = [
+        {
+            "resourceType": "Observation",
+            "id": f"o{i}",
+            "subject": {"reference": "Patient/p1" if i % 2 else "Group/g1"},
+            "code": {"coding": [{"system": "http://snomed.info/sct"}, coding]},
+            "component": [
+                {"code": {"coding": [coding]}, "valueQuantity": {"unit": "mm"}}
+            ]
+            * i,
+        }
+        for i in range(4)
+    ]
+    # A primitive extension makes the shared prefix fall back to fhirpathpy
+    resources[1]["code"]["coding"][1] = coding | {"_code": {"extension": []}}
+    resources.append({"resourceType": "Observation", "id": "x", "code": {}})
+
+    view_evaluator = compile_view(view)._evaluator
+    assert hasattr(view_evaluator.fhirpath_cache[f"{loinc}.code"], "with_memo")
+    # Profiled views evaluate every expression on its own
+    separate = compile_view(view, profiler=Profiler())
+    expected = separate.evaluate(copy.deepcopy(resources))
+    assert len(expected) == 6
+    assert evaluate(copy.deepcopy(resources), view) == expected
+    batches = list(compile_view(view).iter_batches(copy.deepcopy(resources), 2))
+    assert [row["id"] for row in expected] == [
+        value for batch in batches for value in batch["id"]
+    ]
+
+
+def test_run_bulk_resumes_from_checkpoint(tmp_path):
+    """An interrupted run resumes mid-file and writes the same CSV as one run"""
+    export = tmp_path / "export"
+    export.mkdir()
+    for part in range(2):
+        with open(export / f"Patient.{part:03d}.ndjson", "w") as f:
+            for i in range(5):
+                f.write(json.dumps({"resourceType": "Patient", "id": f"{part}-{i}"}))
+                f.write("\n")
+    (export / "Observation.ndjson").write_text('{"resourceType": "Observation"}\n')
+    view = {"resource": "Patient", "column": [{"name": "id", "path": "id"}]}
+
+    stats = run_bulk(str(export), view, str(tmp_path / "all.csv"), batch_size=2)
+    assert (stats.files, stats.resources, stats.rows) == (2, 10, 10)
+    # Only resources of the view's type count, not other lines of a file
+    mixed = tmp_path / "mixed.ndjson"
+    mixed.write_text(
+        '{"resourceType": "Observation"}\n' * 8
+        + '{"resourceType": "Patient", "id": "m1"}\n'
+        + '{"resourceType": "Patient", "id": "m2"}\n'
+    )
+    stats = run_bulk(str(mixed), view, str(tmp_path / "mixed.csv"))
+    assert (stats.resources, stats.rows) == (2, 2)
+
+    def interrupt(stats):
+        if stats.rows >= 6:
+            raise KeyboardInterrupt
+
+    output, checkpoint = str(tmp_path / "out.csv"), str(tmp_path / "checkpoint.json")
+    with pytest.raises(KeyboardInterrupt):
+        run_bulk(
+            str(export),
+            view,
+            output,
+            batch_size=2,
+            checkpoint=checkpoint,
+            checkpoint_interval=0,
+            progress=interrupt,
+            progress_interval=0,
+        )
+    with open(checkpoint) as f:
+        assert json.load(f)["offset"] > 0
+    with pytest.raises(Exception, match="another view, input or output"):
+        part = str(export / "Patient.000.ndjson")
+        run_bulk(part, view, output, batch_size=2, checkpoint=checkpoint)
+    # The same input spelled differently resumes without repeating a file
+    stats = run_bulk(
+        os.path.join(str(export), ".", ""),
+        view,
+        output,
+        batch_size=2,
+        checkpoint=checkpoint,
+    )
+    assert stats.rows == 10
+    assert (tmp_path / "out.csv").read_text() == (tmp_path / "all.csv").read_text()
+    assert not (tmp_path / "checkpoint.json").exists()
+    with pytest.raises(Exception, match="NDJSON or CSV"):
+        run_bulk(
+            str(export), view, str(tmp_path / "out.parquet"), checkpoint=checkpoint
+        )
+
+
+def test_evaluation_service_streams_rows():
+    """Views are registered over HTTP and NDJSON bodies are streamed back as rows"""
+    resources = load_test_file("foreach")["resources"]
+    view = load_test_file("foreach")["tests"][0]["view"]
+    lines = [json.dumps(resource).encode() + b"\n" for resource in resources]
+
+    def requests(address):
+        client = http.client.HTTPConnection(*address)
+        client.request("PUT", "/views/fe", json.dumps(view))
+        response = client.getresponse()
+        assert response.status == 201
+        assert json.loads(response.read())["columns"] == ["id", "family"]
+
+        client.request("POST", "/views/fe/evaluate", iter(lines), encode_chunked=True)
+        response = client.getresponse()
+        assert response.getheader("Transfer-Encoding") == "chunked"
+        rows = [json.loads(line) for line in response.read().splitlines()]
+        assert rows == evaluate(resources, view)
+
+        # Lines split across many small chunks
+        body = b"".join(lines)
+        pieces = (body[i : i + 7] for i in range(0, len(body), 7))
+        client.request("POST", "/views/fe/evaluate", pieces, encode_chunked=True)
+        response = client.getresponse()
+        assert [json.loads(line) for line in response.read().splitlines()] == rows
+
+        client.request("POST", "/views/fe/evaluate?format=csv", b"".join(lines))
+        csv_lines = client.getresponse().read().decode().splitlines()
+        assert len(csv_lines) == len(rows) + 1
+
+        client.request("POST", "/views/missing/evaluate", b"{}")
+        response = client.getresponse()
+        assert (response.status, response.read()) == (404, b'{"error": "Not Found"}')
+        client.request("GET", "/metrics")
+        metrics = json.loads(client.getresponse().read())
+        client.close()
+        assert metrics["views"]["fe"]["rows"] == 3 * len(rows)
+        assert metrics["errors"] == 1
+        assert metrics["latency_seconds"]["p50"] is not None
+
+    async def main():
+        server = await EvaluationService(batch_size=2).start("127.0.0.1", 0)
+        async with server:
+            address = server.sockets[0].getsockname()[:2]
+            await asyncio.get_running_loop().run_in_executor(None, requests, address)
+
+    asyncio.run(main())
+
+
+def test_evaluation_service_reports_errors():
+    """Bad bodies get a 400, and errors while streaming end with a trailer"""
+    view = load_test_file("foreach")["tests"][0]["view"]
+    good = json.dumps(load_test_file("foreach")["resources"][0]).encode()
+
+    def requests(address):
+        client = http.client.HTTPConnection(*address)
+        client.request("POST", "/views/fe/evaluate", b"{not json\n")
+        response = client.getresponse()
+        assert response.status == 400
+        assert "Expecting property name" in json.loads(response.read())["error"]
+        client.close()
+
+        with socket.create_connection(address) as connection:
+            body = good + b"\n{not json\n"
+            connection.sendall(
+                b"POST /views/fe/evaluate HTTP/1.1\r\n"
+                b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+            )
+            response = b""
+            while chunk := connection.recv(65536):
+                response += chunk
+        assert response.startswith(b"HTTP/1.1 200 OK")
+        assert b"Trailer: X-Error" in response
+        assert b'"family": "F1.1"' in response
+        assert b"\r\n0\r\nX-Error: Expecting property name" in response
+        assert response.endswith(b"\r\n\r\n")
+
+    async def main():
+        service = EvaluationService({"fe": view}, batch_size=1, max_pending=1)
+        server = await service.start("127.0.0.1", 0)
+        async with server:
+            address = server.sockets[0].getsockname()[:2]
+            await asyncio.get_running_loop().run_in_executor(None, requests, address)
+        assert service.metrics.errors == 2
+
+    asyncio.run(main())
+
+
+def view_paths(view):
+    paths = [view[key] for key in ("forEach", "forEachOrNull") if key in view]
+    paths += [c["path"] for c in view.get("where", []) + view.get("column", [])]
+    for selection in view.get("select", []) + view.get("unionAll", []):
+        paths += view_paths(selection)
+    return [replace_this(path) for path in paths]
+
+
+def all_nodes(value):
+    yield value
+    children = value.values() if isinstance(value, dict) else value
+    if isinstance(value, (dict, list)):
+        for child in children:
+            yield from all_nodes(child)
+
+
+def evaluate_or_error(fn, focus):
+    try:
+        return fn(focus)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize(
+    "filename",
+    ["basic", "collection", "fhirpath", "fn_empty", "fn_first", "foreach", "where"],
+)
+def test_fast_path_matches_fhirpathpy(filename):
+    """Fast path expressions give the same results as the fhirpathpy interpreter"""
+    data = load_test_file(filename)
+    paths = set()
+    for test_case in data["tests"]:
+        view = test_case["view"]
+        paths |= set(view_paths(view))
+    fast_paths = 0
+    for path in paths:
+        try:
+            interpreter = compile(
+                path,
+                model=models["r4"],
+                options={"userInvocationTable": USER_INVOCATION_TABLE},
+            )
+        except Exception:
+            continue
+        fast = compile_fast_path(interpreter.parsedPath, interpreter)
+        if fast is None:
+            continue
+        fast_paths += 1
+        for focus in all_nodes(data["resources"]):
+            if isinstance(focus, dict):
+                expected = evaluate_or_error(interpreter, copy.deepcopy(focus))
+                assert evaluate_or_error(fast, copy.deepcopy(focus)) == expected
+    assert fast_paths > 0
+
+
+def test_fast_path_reference_keys_match_fhirpathpy():
+    """getResourceKey() and getReferenceKey() give the interpreter's results"""
+    paths = [
+        "getResourceKey()",
+        "subject.getReferenceKey()",
+        "subject.getReferenceKey(Patient)",
+        "performer.getReferenceKey(Practitioner)",
+        "subject.getReferenceKey() = 'p1'",
+        "performer.where(getReferenceKey(Organization) = 'o1').exists()",
+    ]
+    resources = [
+        {
+            "resourceType": "Observation",
+            "id": "x",
+            "subject": {"reference": "Patient/p1"},
+            "performer": [{"reference": "Organization/o1"}, {"display": "a"}],
+        },
+        {"resourceType": "Observation", "subject": {"reference": "p1"}},
+        {"resourceType": "Observation", "id": "y", "subject": {"display": "b"}},
+        {"resourceType": "Observation", "id": "z"},
+    ]
+    for path in paths:
+        interpreter = compile(
+            path,
+            model=models["r4"],
+            options={"userInvocationTable": USER_INVOCATION_TABLE},
+        )
+        fast = compile_fast_path(interpreter.parsedPath, interpreter)
+        assert fast is not None
+        for resource in resources:
+            expected = evaluate_or_error(interpreter, copy.deepcopy(resource))
+            assert evaluate_or_error(fast, copy.deepcopy(resource)) == expected